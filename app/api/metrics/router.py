@@ -0,0 +1,20 @@
+from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import PlainTextResponse
+
+from app.core.config import settings
+from app.services.metrics import metrics
+
+router = APIRouter(tags=["metrics"])
+
+
+class PrometheusResponse(PlainTextResponse):
+    media_type = "text/plain; version=0.0.4"
+
+
+# async on purpose: the scrape must answer even when every threadpool worker is busy
+@router.get("/metrics", response_class=PrometheusResponse, include_in_schema=False)
+async def get_metrics():
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    metrics.sample_threadpool()
+    return PrometheusResponse(await metrics.render_async())
@@ -1,8 +1,10 @@
-import os
-import shutil
-import uuid
-from fastapi import APIRouter, File, HTTPException, UploadFile, status
-from app.services.file_storage import save_uploaded_file
+from fastapi import APIRouter, Depends, File, HTTPException, Request, UploadFile, status
+from sqlalchemy.orm import Session
+from app.core.db import AsyncDB, get_async_db, get_db
+from app.core.security import require_admin
+from app.models.user import User
+from app.services.file_storage import CHUNKS, MAX_MB, save_upload, save_upload_stream
+from app.services.media import collect_garbage, register_media
 
 router = APIRouter(prefix="/uploads", tags=["uploads"])
 
@@ -25,16 +27,41 @@ async def upload_file(file: UploadFile = File(...)):
     
     
 @router.post("/save")
-async def save_file(file: UploadFile = File(...)):
-    saved = save_uploaded_file(file)
+async def save_file(file: UploadFile = File(...), db: AsyncDB = Depends(get_async_db)):
+    saved = await save_upload(file, lambda blob: db.run(register_media, blob))
+    await db.commit()
     
     return {
         "filename": saved["filename"],
         "content_type": saved["content_type"],
         "url": saved["url"],
+        "duplicate": saved["duplicate"],
         # "size": saved["size"],
         # "chunks_size_used": saved["chunks_size_used"],
         # "chunk_calls": saved["chunk_calls"],
         # "chunk_sizes_sample": saved["chunk_sizes_sample"]
     }
-    
\ No newline at end of file
+
+
+@router.post("/stream")
+async def stream_file(request: Request, db: AsyncDB = Depends(get_async_db)):
+    # raw body (no multipart): nothing is spooled before we see it, an oversized upload stops at the limit
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > MAX_MB * CHUNKS:
+        raise HTTPException(status_code=status.HTTP_413_CONTENT_TOO_LARGE, detail=f"File too large. Max size is {MAX_MB} MB")
+
+    saved = await save_upload_stream(request.stream(), lambda blob: db.run(register_media, blob))
+    await db.commit()
+    return {
+        "filename": saved["filename"],
+        "content_type": saved["content_type"],
+        "url": saved["url"],
+        "size": saved["size"],
+        "duplicate": saved["duplicate"],
+    }
+
+
+@router.post("/gc")
+def media_gc(db: Session = Depends(get_db), _admin: User = Depends(require_admin)):
+    deleted = collect_garbage(db)
+    return {"deleted": len(deleted), "urls": deleted}
@@ -1,6 +1,7 @@
 from re import S
 from sqlalchemy import select
 from sqlalchemy.orm import Session
+from app.core.db import AsyncRepository
 from app.models.user import User
 
 class UserRepository:
@@ -28,5 +29,11 @@ class UserRepository:
         self.db.flush()
         self.db.refresh(user)
         return user
-    
-    
\ No newline at end of file
+
+
+class AsyncUserRepository(AsyncRepository):
+    async def get(self, user_id) -> User | None:
+        return await self.db.run(lambda session: UserRepository(session).get(user_id))
+
+    async def get_by_email(self, email: str) -> User | None:
+        return await self.db.run(lambda session: UserRepository(session).get_by_email(email))
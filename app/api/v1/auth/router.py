@@ -1,10 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, Path, status
 from fastapi.security import OAuth2PasswordRequestForm
-from app.api.v1.auth.repository import UserRepository
-from app.core.db import get_db
+from app.api.v1.auth.repository import AsyncUserRepository, UserRepository
+from app.core.db import AsyncDB, get_async_db, get_db
+from app.services.cache import post_cache
 from app.models.user import User
 from .schemas import RoleUpdate, TokenResponse, UserCreate, UserLogin, UserPublic
-from app.core.security import create_access_token, get_current_user, hash_password, verify_password, require_admin, auth2_token
+from app.core.security import create_access_token, get_current_user, hash_password, verify_password_async, require_admin, auth2_token
+from app.services.password_pool import password_pool
 from sqlalchemy.orm import Session
 
 
@@ -30,17 +32,18 @@ def register(payload: UserCreate, db: Session = Depends(get_db)):
  
 
 @router.post("/login", response_model=TokenResponse)
-async def login(payload: UserLogin, db: Session = Depends(get_db)):
-    repository = UserRepository(db)
-    user = repository.get_by_email(payload.email)
+async def login(payload: UserLogin, db: AsyncDB = Depends(get_async_db)):
+    repository = AsyncUserRepository(db)
+    user = await repository.get_by_email(payload.email)
+    await db.close()  # no connection held while argon2 runs
     
-    if not user or not verify_password(payload.password, user.hashed_password):
+    if not user or not await verify_password_async(payload.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    token = create_access_token(sub=str(user.id), minutes=60*24*7)  # 7 days
+    token = create_access_token(sub=str(user.id), minutes=60*24*7, version=user.version)  # 7 days
     return TokenResponse(access_token=token, user=UserPublic.model_validate(user))
 
 
@@ -65,10 +68,16 @@ def set_role(
         )
     updated = repository.set_role(user, payload.role)
     db.commit()
+    post_cache.invalidate(("user", user_id))
     
     db.refresh(updated)
     return UserPublic.model_validate(updated)
 
 @router.post("/token")
 async def token_endpoint(response=Depends(auth2_token)):
-    return response
\ No newline at end of file
+    return response
+
+
+@router.get("/password-pool/stats")
+def password_pool_stats(_admin: User = Depends(require_admin)):
+    return password_pool.stats()
\ No newline at end of file
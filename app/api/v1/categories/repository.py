@@ -8,6 +8,7 @@ from sqlalchemy import select, func
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
+from app.core.db import AsyncRepository
 from app.models.category import CategoryORM
 from app.services.pagination import paginated_query
 
@@ -31,7 +32,7 @@ class CategoryRepository:
             page = page,
             per_page = per_page,
             order_by = 'id',
-            allowed_order = None
+            alowed_order = None
         )
         
         return pagination["total"], pagination["items"]
@@ -63,4 +64,14 @@ class CategoryRepository:
 
     def delete(self, category: CategoryORM) -> None:
         self.db.delete(category)
-        
\ No newline at end of file
+
+
+class AsyncCategoryRepository(AsyncRepository):
+    async def list_many(self, *, skip: int = 0, limit: int = 50) -> Sequence[CategoryORM]:
+        return await self.db.run(lambda session: CategoryRepository(session).list_many(skip=skip, limit=limit))
+
+    async def get(self, category_id: int) -> CategoryORM | None:
+        return await self.db.run(lambda session: CategoryRepository(session).get(category_id))
+
+    async def get_by_slug(self, slug: str) -> CategoryORM | None:
+        return await self.db.run(lambda session: CategoryRepository(session).get_by_slug(slug))
@@ -1,17 +1,26 @@
 import re
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.orm import Session
-from app.api.v1.categories.repository import CategoryRepository
-from app.core.db import get_db
+from sqlalchemy.orm.exc import StaleDataError
+from app.api.v1.categories.repository import AsyncCategoryRepository, CategoryRepository
+from app.core.db import AsyncDB, get_async_read_db, get_db
+from app.services.cache import post_cache
+from app.services.etag import conditional, make_etag, table_versions
+from app.models.category import CategoryORM
 from app.api.v1.categories.schemas import CategoryCreate, CategoryUpdate, CategoryPublic
 
 router = APIRouter(prefix="/categories", tags=["categories"])
 
 
 @router.get("", response_model=list[CategoryPublic])
-def list_categories(skip: int = 0, limit: int = 50, db: Session = Depends(get_db)):
-    repository = CategoryRepository(db)
-    return repository.list_many(skip=skip, limit=limit)
+async def list_categories(request: Request, response: Response, skip: int = 0, limit: int = 50, db: AsyncDB = Depends(get_async_read_db)):
+    etag = make_etag("categories", await db.run(table_versions, CategoryORM.__tablename__), skip, limit)
+    unchanged = conditional(request, response, etag)
+    if unchanged:
+        return unchanged
+    
+    repository = AsyncCategoryRepository(db)
+    return await repository.list_many(skip=skip, limit=limit)
 
 
 @router.post("", response_model=CategoryPublic, status_code=status.HTTP_201_CREATED)
@@ -28,11 +37,15 @@ def create_category(data: CategoryCreate, db: Session = Depends(get_db)):
 
 
 @router.get("/{category_id}", response_model=CategoryPublic)
-def get_category(category_id: int, db: Session = Depends(get_db)):
-    repository = CategoryRepository(db)
-    category = repository.get(category_id)
+async def get_category(request: Request, response: Response, category_id: int, db: AsyncDB = Depends(get_async_read_db)):
+    repository = AsyncCategoryRepository(db)
+    category = await repository.get(category_id)
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
+    
+    unchanged = conditional(request, response, make_etag("category", category.id, category.version))
+    if unchanged:
+        return unchanged
     return category
 
 
@@ -43,8 +56,13 @@ def update_category(category_id: int, data: CategoryUpdate, db: Session = Depend
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
     
-    updated = repository.update(category, data.model_dump(exclude_unset=True))
-    db.commit()
+    try:
+        updated = repository.update(category, data.model_dump(exclude_unset=True))
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Category was modified by another request, reload it and retry")
+    post_cache.invalidate(("category", category_id))
     db.refresh(updated)
     return updated
 
@@ -55,6 +73,11 @@ def delete_category(category_id: int, db: Session = Depends(get_db)):
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
     
-    repository.delete(category)
-    db.commit()
+    try:
+        repository.delete(category)
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Category was modified by another request, reload it and retry")
+    post_cache.invalidate(("category", category_id))
     return None
\ No newline at end of file
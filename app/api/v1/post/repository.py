@@ -1,33 +1,76 @@
 
 import sqlite3
-from typing import Optional, List, Tuple
+from typing import Iterator, Optional, List, Tuple, TYPE_CHECKING
 from fastapi import Depends, HTTPException
 from fastapi.background import P
-from sqlalchemy import select, func, text
+from datetime import datetime
+from sqlalchemy import String, insert, select, func, text, tuple_
 from math import ceil
-from sqlalchemy.orm import Session, selectinload, joinedload
-from app.models import PostORM, TagORM
+from sqlalchemy.orm import Session
+from app.models import CategoryORM, PostORM, TagORM, post_tags
 from app.models.user import User
+from app.models.profiles import with_fields, with_profile
+from app.api.v1.tags.repository import TagRepository
+from app.core.db import AsyncRepository
 from app.core.security import get_current_user
-from app.utils.slugify_utils import ensure_unique_slug, slugify_base
+from app.utils.slugify_utils import allocate_slugs, ensure_unique_slug, slugify_base
+from app.services.pagination import CountMode, count_query, keyset_page, mark_written
+from app.services.search import apply_search, index_new_posts, index_post, unindex_post
 
 
+if TYPE_CHECKING:
+    from .schemas import PostCreate
+
 
 class PostRepository:
     def __init__(self, db: Session):
         self.db = db
 
-    def get(self, post_id: int) -> Optional[PostORM]:
-        post_find = select(PostORM).where(PostORM.id == post_id)
+    def select_posts(self, profile: str = "post_full", fields: Optional[Tuple[str, ...]] = None):
+        # a sparse fieldset loads only the columns/relationships it names, otherwise the profile decides
+        if fields:
+            return with_fields(select(PostORM), fields)
+        return with_profile(select(PostORM), profile)
+
+    def get(self, post_id: int, profile: str = "post_full", fields: Optional[Tuple[str, ...]] = None) -> Optional[PostORM]:
+        post_find = self.select_posts(profile, fields).where(PostORM.id == post_id)
         return self.db.execute(post_find).scalar_one_or_none()
     
     
-    def get_by_slug(self, slug: str) -> Optional[PostORM]:
+    def get_by_slug(self, slug: str, profile: str = "post_full", fields: Optional[Tuple[str, ...]] = None) -> Optional[PostORM]:
         query = (
-            select(PostORM).where(PostORM.slug == slug)
+            self.select_posts(profile, fields).where(PostORM.slug == slug)
         )
         return self.db.execute(query).scalar_one_or_none()
 
+    def version_key(self, post_id: Optional[int] = None, slug: Optional[str] = None) -> Optional[tuple]:
+        # versions of every row PostPublic is built from, read without loading content or relationships
+        query = (
+            select(PostORM.id, PostORM.version, CategoryORM.version, User.version)
+            .outerjoin(CategoryORM, CategoryORM.id == PostORM.category_id)
+            .outerjoin(User, User.id == PostORM.user_id)
+            .where(PostORM.slug == slug if slug is not None else PostORM.id == post_id)
+        )
+        row = self.db.execute(query).first()
+        if not row:
+            return None
+
+        tags = self.db.execute(
+            select(TagORM.id, TagORM.version)
+            .join(post_tags, post_tags.c.tag_id == TagORM.id)
+            .where(post_tags.c.post_id == row[0])
+            .order_by(TagORM.id)
+        ).all()
+        return tuple(row), tuple(tuple(tag) for tag in tags)
+
+    def order_columns(self, order_by: str, rank=None) -> list:
+        # id is always the last key so rows with the same title/rank keep a stable order
+        if order_by == "relevance" and rank is not None:
+            return [rank, PostORM.id]
+        if order_by == "title":
+            return [func.lower(PostORM.title, type_=String), PostORM.id]
+        return [PostORM.id]
+
     def search(
         self,
         query: Optional[str],
@@ -35,47 +78,110 @@ class PostRepository:
         direction: str,
         page: int,
         per_page: int,
-    ) -> Tuple[int, List[PostORM]]:
+        count: CountMode = "exact",
+        fields: Optional[Tuple[str, ...]] = None,
+    ) -> Tuple[Optional[int], List[PostORM], bool]:
 
-        results = select(PostORM)
+        results = self.select_posts("post_full", fields)
+        rank = None
 
         query = query or None
 
         if query:
-            results = results.where(PostORM.title.ilike(f"%{query}%"))
+            results, rank = apply_search(self.db, results, query)
         # for post in BLOG_POSTS:
         #     if query.lower() in post["title"].lower():
         #         results.append(post)
-        total = self.db.scalar(select(func.count()).select_from(results.subquery())) or 0
-        if total == 0:
-            return 0, []
+        total = count_query(self.db, results, count)
+        if total == 0 and count in ("exact", "cached"):
+            return 0, [], False
         
 
-        current_page = min(page, max(1, ceil(total / per_page)))
-        order_col = PostORM.id if order_by == "id" else func.lower(PostORM.title)
-        
+        # only a trusted total may clamp the page, estimates and skipped counts take it as asked
+        current_page = min(page, max(1, ceil(total / per_page))) if count in ("exact", "cached") else page
 
         results = results.order_by(
-            order_col.asc() if direction == "asc" else order_col.desc()
+            *[col.asc() if direction == "asc" else col.desc() for col in self.order_columns(order_by, rank)]
         )
 
        
     
         start = (current_page - 1) * per_page
-        items = self.db.execute(results.limit(per_page).offset(start)).scalars().all()
+        items = self.db.execute(results.limit(per_page + 1).offset(start)).scalars().all()
         
-        return total, items
+        return total, items[:per_page], len(items) > per_page
+
+    def search_after(
+        self,
+        query: Optional[str],
+        order_by: str,
+        direction: str,
+        per_page: int,
+        cursor: Optional[str],
+        fields: Optional[Tuple[str, ...]] = None,
+    ) -> Tuple[List[PostORM], Optional[str]]:
+
+        results = self.select_posts("post_full", fields)
+        rank = None
+
+        if query:
+            results, rank = apply_search(self.db, results, query)
 
+        return keyset_page(self.db, results, self.order_columns(order_by, rank), order_by, direction, per_page, cursor)
+
+    def export(
+        self,
+        category_id: Optional[int] = None,
+        tag: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        batch_size: int = 1000,
+    ) -> Iterator[dict]:
+        # server-side cursor + yield_per: rows arrive batch by batch and the identity map
+        # only holds them weakly, so memory stays flat whatever the table size
+        query = (
+            with_profile(select(PostORM), "post_full")
+            .order_by(PostORM.id)
+            .execution_options(stream_results=True, yield_per=batch_size)
+        )
+        if category_id is not None:
+            query = query.where(PostORM.category_id == category_id)
+        if tag:
+            query = query.where(PostORM.tags.any(func.lower(TagORM.name) == tag.strip().lower()))
+        if since is not None:
+            query = query.where(PostORM.create_at >= since)
+        if until is not None:
+            query = query.where(PostORM.create_at < until)
+        
+        result = self.db.execute(query)
+        try:
+            for partition in result.scalars().partitions():
+                for post in partition:
+                    yield {
+                        "id": post.id,
+                        "slug": post.slug,
+                        "title": post.title,
+                        "content": post.content,
+                        "image_url": post.image_url,
+                        "create_at": post.create_at.isoformat() if post.create_at else None,
+                        "author_email": post.user.email if post.user else None,
+                        "author_name": post.user.full_name if post.user else None,
+                        "category_id": post.category_id,
+                        "category": post.category.name if post.category else None,
+                        "tags": [tag.name for tag in post.tags],
+                    }
+        finally:
+            # also when the consumer stops early (closed generator): the cursor goes now, not at GC
+            result.close()
+    
     def by_tags(self, tags_names: List[str]) -> List[PostORM]:
         normalized_tag_names = [tag.strip().lower() for tag in tags_names if tag.strip()]
         if not normalized_tag_names:
             return []
     
         post_list = (
-            select(PostORM).options(
-                selectinload(PostORM.tags), # se carga la lista de tags
-                joinedload(PostORM.user), # se carga el autor
-            ).where(PostORM.tags.any(func.lower(TagORM.name).in_(normalized_tag_names))) # dentro de la lista de tags se busca cualquier que coincida con el nombre de la etiqueta
+            with_profile(select(PostORM), "post_full") # se cargan los tags, el autor y la categoria
+            .where(PostORM.tags.any(func.lower(TagORM.name).in_(normalized_tag_names))) # dentro de la lista de tags se busca cualquier que coincida con el nombre de la etiqueta
             .order_by(PostORM.id.desc()) # se ordena por id descendente
         )
         
@@ -91,18 +197,7 @@ class PostRepository:
         
     def ensure_tag(self, name: str) -> TagORM:
         
-        normalize = name.strip().lower()
-        tag_obj = self.db.execute(select(TagORM).where(func.lower(TagORM.name) == normalize)).scalar_one_or_none() # para SQLite
-        # tag_obj = self.db.execute(select(TagORM).where(TagORM.name.ilike(name))).scalar_one_or_none() // para Postgres
-        
-        if tag_obj:
-            return tag_obj
-        
-        tag_obj = TagORM(name=name)
-        self.db.add(tag_obj)
-        self.db.flush()
-        
-        return tag_obj
+        return TagRepository(self.db).ensure_tags([name])[0]
 
     def create_post(self, title: str, content:str,tags: List[dict], image_url: str, category_id: Optional[int], user: User = Depends(get_current_user)) -> PostORM:
         author_obj = None
@@ -117,24 +212,86 @@ class PostRepository:
         post = PostORM(title=title, slug=unique_slug, content=content,image_url=image_url, user=author_obj, category_id=category_id)
         
         
-        names = tags[0]['name'].split(',')
-        for name in names:
-            name = name.strip().lower()
-            if not name:
-                continue
-            tag_obj = self.ensure_tag(name)
-            post.tags.append(tag_obj)
+        names = [name.strip().lower() for tag in tags for name in tag['name'].split(',')]
+        post.tags.extend(TagRepository(self.db).ensure_tags(names))
             
         self.db.add(post)
         self.db.flush()
         self.db.refresh(post)
+        index_post(self.db, post)
         return post
     
+    def bulk_create(self, records: List[Tuple[int, "PostCreate"]], user: User) -> Tuple[int, List[Tuple[int, str]]]:
+        """Insert a chunk of validated posts with set-based lookups and executemany, returns (created, [(line, error)])."""
+        errors = []
+        
+        # the (title, content) pair is unique, reject repeats against the table and within the chunk
+        pairs = {(post.title, post.content) for _, post in records}
+        existing = set(
+            tuple(row) for row in self.db.execute(
+                select(PostORM.title, PostORM.content).where(tuple_(PostORM.title, PostORM.content).in_(pairs))
+            )
+        )
+        category_ids = {post.category_id for _, post in records if post.category_id}
+        known_categories = set(
+            self.db.execute(select(CategoryORM.id).where(CategoryORM.id.in_(category_ids))).scalars()
+        ) if category_ids else set()
+        
+        accepted = []
+        for line, post in records:
+            pair = (post.title, post.content)
+            if pair in existing:
+                errors.append((line, "a post with this title and content already exists"))
+            elif post.category_id and post.category_id not in known_categories:
+                errors.append((line, f"category_id {post.category_id} does not exist"))
+            else:
+                existing.add(pair)
+                accepted.append(post)
+        
+        if not accepted:
+            return 0, errors
+        
+        names = [[name.strip().lower() for tag in post.tags for name in tag.name.split(',')] for post in accepted]
+        tag_ids = {tag.name.lower(): tag.id for tag in TagRepository(self.db).ensure_tags(n for post_names in names for n in post_names)}
+        slugs = allocate_slugs(self.db, [post.title for post in accepted])
+        
+        now = datetime.utcnow()
+        rows = [
+            {
+                "title": post.title,
+                "slug": slug,
+                "content": post.content,
+                "user_id": user.id if user else None,
+                "category_id": post.category_id,
+                "create_at": now,
+            }
+            for post, slug in zip(accepted, slugs)
+        ]
+        ids = self.db.execute(
+            insert(PostORM).returning(PostORM.id, sort_by_parameter_order=True), rows
+        ).scalars().all()
+        
+        links = {
+            (post_id, tag_ids[name.strip().lower()])
+            for post_id, post_names in zip(ids, names)
+            for name in post_names if name.strip()
+        }
+        if links:
+            self.db.execute(post_tags.insert(), [{"post_id": post_id, "tag_id": tag_id} for post_id, tag_id in links])
+        
+        index_new_posts(self.db, [{"id": post_id, **row} for post_id, row in zip(ids, rows)])
+        mark_written(self.db, PostORM.__tablename__, post_tags.name)
+        
+        return len(ids), errors
+    
     def update_post(self, post: PostORM, updates: dict) -> PostORM:
         
         for key, value in updates.items():
             setattr(post, key, value)
             
+        if "title" in updates or "content" in updates:
+            self.db.flush()
+            index_post(self.db, post)
             
         return post
         
@@ -142,5 +299,25 @@ class PostRepository:
     
     def delete_post(self, post: PostORM)-> None:
        
+        unindex_post(self.db, post.id)
         self.db.delete(post) #se elimina el post
-          
\ No newline at end of file
+
+
+class AsyncPostRepository(AsyncRepository):
+    async def get(self, post_id: int, profile: str = "post_full", fields: Optional[Tuple[str, ...]] = None) -> Optional[PostORM]:
+        return await self.db.run(lambda session: PostRepository(session).get(post_id, profile, fields))
+
+    async def get_by_slug(self, slug: str, profile: str = "post_full", fields: Optional[Tuple[str, ...]] = None) -> Optional[PostORM]:
+        return await self.db.run(lambda session: PostRepository(session).get_by_slug(slug, profile, fields))
+
+    async def version_key(self, post_id: Optional[int] = None, slug: Optional[str] = None) -> Optional[tuple]:
+        return await self.db.run(lambda session: PostRepository(session).version_key(post_id, slug))
+
+    async def search(self, *args, **kwargs) -> Tuple[Optional[int], List[PostORM], bool]:
+        return await self.db.run(lambda session: PostRepository(session).search(*args, **kwargs))
+
+    async def search_after(self, *args, **kwargs) -> Tuple[List[PostORM], Optional[str]]:
+        return await self.db.run(lambda session: PostRepository(session).search_after(*args, **kwargs))
+
+    async def by_tags(self, tags_names: List[str]) -> List[PostORM]:
+        return await self.db.run(lambda session: PostRepository(session).by_tags(tags_names))
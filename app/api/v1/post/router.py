@@ -1,20 +1,127 @@
+import csv
+import io
+import json
 import time
+from contextlib import closing
+from datetime import datetime
 from math import ceil
-from typing import Annotated, List, Literal, Optional, Union
-from fastapi import APIRouter, Depends, File,Path, Query, UploadFile, status, HTTPException
+from typing import Annotated, Iterator, List, Literal, Optional, Tuple, Union
+import anyio
+from fastapi import APIRouter, Depends, File,Path, Query, Request, Response, UploadFile, status, HTTPException
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
-from app.core.db import get_db
+from sqlalchemy.orm.exc import StaleDataError
+from app.core.db import AsyncDB, get_async_read_db, get_db, read_session, replicas_may_lag
+from app.models import CategoryORM, PostORM, TagORM, post_tags
 from app.models.user import User
-from .schemas import (PostPublic, PaginatedPosts, PostCreate, PostUpdate, PostSummary)
-from .repository import PostRepository
+from .schemas import (POST_FIELDS, PostPublic, PaginatedPosts, PostCreate, PostUpdate, PostSummary, post_fields_model)
+from .repository import AsyncPostRepository, PostRepository
 from app.services.file_storage import save_uploaded_file
+from app.services.media import claim_media, register_media
+from app.services.pagination import CountMode
+from app.services.bulk_import import MAX_REPORTED_ERRORS, parse_records, validation_messages
+from app.services.cache import post_cache
+from app.services.etag import conditional, make_etag, not_modified, not_modified_response, table_versions
 
 from app.core.security import outh2_scheme, get_current_user, require_editor, require_admin
 
 
 router = APIRouter( prefix="/posts", tags=["posts"] )
 
+# every table a listed post is rendered from, their change counters make the list ETag
+LISTING_TABLES = (PostORM.__tablename__, post_tags.name, TagORM.__tablename__, CategoryORM.__tablename__, User.__tablename__)
+
+
+FIELDS_QUERY = Query(
+    default=None,
+    description=f"Comma separated fields to return (sparse fieldset), any of: {', '.join(POST_FIELDS)}. id is always included",
+    title="Fields",
+    example="id,title,slug",
+)
+
+
+def parse_fields(fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    if fields is None:
+        return None
+    names = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = names - set(POST_FIELDS)
+    if unknown:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}. Allowed: {', '.join(POST_FIELDS)}",
+        )
+    # canonical order: the same set always gives the same cache key, ETag and schema
+    return tuple(name for name in POST_FIELDS if name in names or name == "id")
+
+
+def post_dependencies(post, relationships) -> set:
+    # rows whose changes must drop a cached post response, deleting a category unsets its posts
+    deps = {("post", post.id)}
+    if post.category_id:
+        deps.add(("category", post.category_id))
+    if "tags" in relationships:
+        deps.update(("tag", tag.id) for tag in post.tags)
+    if "user" in relationships and post.user_id:
+        deps.add(("user", post.user_id))
+    return deps
+
+
+def cached_post_response(key: tuple, post, include_content: bool, fields: Optional[Tuple[str, ...]], etag: str, generation: int, cacheable: bool = True) -> Response:
+    if fields:
+        schema, relationships = post_fields_model(fields), fields
+    elif include_content:
+        schema, relationships = PostPublic, ("tags", "user")
+    else:
+        schema, relationships = PostSummary, ()
+    body = schema.model_validate(post, from_attributes=True).model_dump_json().encode()
+    if cacheable:
+        post_cache.set(key, (etag, body), post_dependencies(post, relationships), generation)
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
+async def read_post(request: Request, repository: AsyncPostRepository, cache_key: tuple, include_content: bool, fields: Optional[Tuple[str, ...]] = None, **lookup) -> Response:
+    # cache hit -> no DB at all; If-None-Match hit -> only the version columns are read
+    cached = post_cache.get(cache_key)
+    if cached is not None:
+        etag, body = cached
+        if not_modified(request, etag):
+            return not_modified_response(etag)
+        return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+    generation = post_cache.generation
+    version = await repository.version_key(**lookup)
+    if not version:
+        raise HTTPException(status_code=404, detail="Post not found")
+
+    etag = make_etag("post", include_content, fields, version)
+    if not_modified(request, etag):
+        return not_modified_response(etag)
+
+    # fields wins over include_content: both only select what the response renders
+    profile = "post_full" if include_content else "post_summary"
+    if "post_id" in lookup:
+        post = await repository.get(lookup["post_id"], profile, fields)
+    else:
+        post = await repository.get_by_slug(lookup["slug"], profile, fields)
+    if not post:
+        raise HTTPException(status_code=404, detail="Post not found")
+
+    # a lagging replica could put a pre-write version back into the shared cache
+    cacheable = not (repository.db.replica and replicas_may_lag())
+    return cached_post_response(cache_key, post, include_content, fields, etag, generation, cacheable)
+
+
+def sparse_page(page: PaginatedPosts, items: List[PostORM], fields: Tuple[str, ...], etag: str) -> Response:
+    # PaginatedPosts declares full PostPublic items, a sparse page is serialized by hand
+    schema = post_fields_model(fields)
+    body = page.model_dump(mode="json")
+    body["items"] = [schema.model_validate(post).model_dump(mode="json") for post in items]
+    return JSONResponse(content=body, headers={"ETag": etag})
+
+
 # @router.get("/sync")
 # def sync_endpoint():
 #     print('sync endpoint started:', threading.current_thread().name)
@@ -44,7 +151,9 @@ router = APIRouter( prefix="/posts", tags=["posts"] )
 #     return {"message": "access token", "token_data": token}
 
 @router.get("", response_model=PaginatedPosts)
-def list_posts(
+async def list_posts(
+    request: Request,
+    response: Response,
 
     text: Optional[str] | None = Query(
         default=None,
@@ -74,9 +183,9 @@ def list_posts(
         title="Posts per page",
         example=5,
     ),
-    order_by: Literal["id", "title"] = Query(
+    order_by: Literal["id", "title", "relevance"] = Query(
         "id",
-        description="The field to order the results by",
+        description="The field to order the results by, relevance ranks search matches (falls back to id without search)",
         title="Order by",
         example="id",
     ),
@@ -86,23 +195,63 @@ def list_posts(
         title="Direction",
         example="asc",
     ),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(
+        default=None,
+        description="Opaque cursor from next_cursor, send it empty to start cursor mode (page is ignored)",
+        title="Cursor",
+    ),
+    count: CountMode = Query(
+        "exact",
+        description="How total is computed: exact, cached (short TTL, dropped on writes), estimated (planner statistics) or skip (no total)",
+        title="Count mode",
+    ),
+    fields: Optional[str] = FIELDS_QUERY,
+    db: AsyncDB = Depends(get_async_read_db),
     
 ):
     
-    repository = PostRepository(db)
+    repository = AsyncPostRepository(db)
     query = query or None
+    fields = parse_fields(fields)
+
+    etag = make_etag(
+        "posts", await db.run(table_versions, *LISTING_TABLES),
+        query, page, per_page, order_by, direction, cursor, count, fields,
+    )
+    unchanged = conditional(request, response, etag)
+    if unchanged:
+        return unchanged
 
-    total, items = repository.search(query, order_by, direction, page, per_page)
+    if cursor is not None:
+        items, next_cursor = await repository.search_after(query, order_by, direction, per_page, cursor, fields)
+        result = PaginatedPosts(
+            per_page=per_page,
+            has_prev=bool(cursor),
+            has_next=next_cursor is not None,
+            order_by=order_by,
+            direction=direction,
+            search=query,
+            next_cursor=next_cursor,
+            items=[] if fields else items,
+        )
+        return sparse_page(result, items, fields, etag) if fields else result
+
+    total, items, has_next = await repository.search(query, order_by, direction, page, per_page, count, fields)
     
-    total_pages = ceil(total / per_page) if total > 0 else 0
-    current_page = 1 if total_pages == 0 else min(page, total_pages)
+    if total is None:
+        total_pages = None
+        current_page = page
+    elif count == "estimated":
+        total_pages = ceil(total / per_page)
+        current_page = page
+    else:
+        total_pages = ceil(total / per_page) if total > 0 else 0
+        current_page = 1 if total_pages == 0 else min(page, total_pages)
         
     has_prev = current_page > 1
-    has_next = current_page < total_pages if total_pages > 0 else False
     
     
-    return PaginatedPosts(
+    result = PaginatedPosts(
         page=current_page,
         per_page=per_page,
         total=total,
@@ -112,34 +261,101 @@ def list_posts(
         order_by=order_by,
         direction=direction,
         search=query,
-        items=items,
+        count_mode=count,
+        items=[] if fields else items,
     )
+    return sparse_page(result, items, fields, etag) if fields else result
     
     
     
     
 @router.get("/by-tags", response_model=List[PostPublic])
-def filter_by_tags(
+async def filter_by_tags(
+    request: Request,
+    response: Response,
     tags: List[str] = Query(
         ...,
         min_length=2, 
         description="The tags to filter by: example: ?tags=python&tags=fastapi",
         example=["python", "fastapi"]
         ),
-    db: Session = Depends(get_db)
+    db: AsyncDB = Depends(get_async_read_db)
     ):
     
-    repository = PostRepository(db)
+    repository = AsyncPostRepository(db)
     
-    return repository.by_tags(tags)
+    etag = make_etag("by-tags", await db.run(table_versions, *LISTING_TABLES), sorted(tags))
+    unchanged = conditional(request, response, etag)
+    if unchanged:
+        return unchanged
     
+    return await repository.by_tags(tags)
+    
+
+class ClosingStreamingResponse(StreamingResponse):
+    """StreamingResponse over a sync generator that is closed however the stream ends: a client
+    that disconnects half way leaves no session or server-side cursor waiting for the GC."""
+
+    def __init__(self, content: Iterator, *args, **kwargs):
+        super().__init__(content, *args, **kwargs)
+        self.source = content
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            # shielded: on a disconnect this runs inside an already cancelled scope
+            with anyio.CancelScope(shield=True):
+                await run_in_threadpool(self.source.close)
+
+
+EXPORT_FIELDS = ["id", "slug", "title", "content", "image_url", "create_at", "author_email", "author_name", "category_id", "category", "tags"]
+
+
+@router.get("/export", response_description="All matching posts streamed as NDJSON or CSV")
+def export_posts(
+    request: Request,
+    format: Literal["ndjson", "csv"] = Query("ndjson", description="ndjson or csv"),
+    category_id: Optional[int] = Query(None, ge=1),
+    tag: Optional[str] = Query(None, min_length=2, max_length=30),
+    since: Optional[datetime] = Query(None, description="Created at or after (ISO 8601)"),
+    until: Optional[datetime] = Query(None, description="Created before (ISO 8601)"),
+    _admin: User = Depends(require_admin),
+):
+    def rows():
+        # own session: the stream outlives the request dependencies
+        with read_session(request) as session:
+            with closing(PostRepository(session).export(category_id=category_id, tag=tag, since=since, until=until)) as records:
+                if format == "ndjson":
+                    for record in records:
+                        yield json.dumps(record, ensure_ascii=False) + "\n"
+                    return
+                
+                buffer = io.StringIO()
+                writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+                writer.writeheader()
+                for record in records:
+                    writer.writerow({**record, "tags": ",".join(record["tags"])})
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+                yield buffer.getvalue()
+    
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/csv"
+    return ClosingStreamingResponse(
+        rows(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="posts.{format}"'},
+    )
+
 
 @router.get(
     "/{post_id}",
     response_model=Union[PostPublic, PostSummary],
     response_description="A single blog post",
 )
-def get_post(
+async def get_post(
+    request: Request,
     post_id: int = Path(
         ...,
         ge=1,
@@ -147,20 +363,12 @@ def get_post(
         description="The ID of the blog post. Must be greater than 1.",
         example=1,
     ),
-        include_content: bool = Query(default=True, description="false or true"), db: Session = Depends(get_db)):
-    
-    
-    repository = PostRepository(db)
-    post = repository.get(post_id)
+        include_content: bool = Query(default=True, description="false or true"),
+        fields: Optional[str] = FIELDS_QUERY, db: AsyncDB = Depends(get_async_read_db)):
     
-        
-    if not post:
-        raise HTTPException(status_code=404, detail="Post not found")
-        
-    if include_content:
-        return PostPublic.model_validate(post, from_attributes=True)
-        
-    return PostSummary.model_validate(post, from_attributes=True)
+    repository = AsyncPostRepository(db)
+    fields = parse_fields(fields)
+    return await read_post(request, repository, ("id", post_id, include_content, fields), include_content, fields, post_id=post_id)
 
 
 
@@ -179,7 +387,7 @@ def create_post(post: Annotated[PostCreate, Depends(PostCreate.as_form)], image:
     saved = None
     try:
         if image is not None:
-            saved = save_uploaded_file(image)
+            saved = save_uploaded_file(image, lambda blob: register_media(db, blob))
         image_url = saved["url"] if saved else None
         
         post = repository.create_post(
@@ -191,10 +399,13 @@ def create_post(post: Annotated[PostCreate, Depends(PostCreate.as_form)], image:
             image_url=image_url
         )
         db.commit()
-        db.refresh(post)
-        return post
+        post_cache.invalidate(("post", post.id))
+        return repository.get(post.id)
     except IntegrityError as e:
         db.rollback()
+        if "foreign key" in str(e.orig).lower():
+            # foreign keys are enforced on SQLite too, a category_id that does not exist lands here
+            raise HTTPException(status_code=422, detail="category_id does not exist")
         raise HTTPException(status_code=409, detail="Post Title already exists, please choose another title , error: " + str(e))
     except SQLAlchemyError:
         db.rollback()
@@ -202,6 +413,65 @@ def create_post(post: Annotated[PostCreate, Depends(PostCreate.as_form)], image:
     
     
     
+@router.post(
+    "/bulk",
+    response_description="per-line import report",
+)
+async def bulk_import(
+    request: Request,
+    format: Optional[Literal["ndjson", "csv"]] = Query(
+        default=None,
+        description="Body format, defaults to csv for a text/csv Content-Type and ndjson otherwise",
+    ),
+    chunk_size: int = Query(500, ge=1, le=5000, description="Records inserted per transaction"),
+    db: Session = Depends(get_db),
+    _admin: User = Depends(require_admin),
+):
+    fmt = format or ("csv" if "csv" in request.headers.get("content-type", "") else "ndjson")
+    repository = PostRepository(db)
+    report = {"format": fmt, "received": 0, "created": 0, "failed": 0, "errors": []}
+    
+    def fail(line: int, errors: List[str]) -> None:
+        report["failed"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"line": line, "errors": errors})
+    
+    def insert_chunk(chunk: list) -> None:
+        try:
+            created, errors = repository.bulk_create(chunk, _admin)
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            created, errors = 0, [(line, f"DB error importing chunk: {e.__class__.__name__}") for line, _ in chunk]
+        report["created"] += created
+        for line, error in errors:
+            fail(line, [error])
+    
+    chunk = []
+    async for line, data, error in parse_records(request.stream(), fmt):
+        report["received"] += 1
+        if error:
+            fail(line, [error])
+            continue
+        try:
+            chunk.append((line, PostCreate.model_validate({**data, "tags": [{"name": name} for name in data["tags"]]})))
+        except ValidationError as e:
+            fail(line, validation_messages(e))
+            continue
+        
+        if len(chunk) >= chunk_size:
+            # the DB work is sync, keep it off the event loop while the body keeps streaming in
+            await run_in_threadpool(insert_chunk, chunk)
+            chunk = []
+    
+    if chunk:
+        await run_in_threadpool(insert_chunk, chunk)
+    
+    report["errors"].sort(key=lambda item: item["line"])
+    report["errors_truncated"] = report["failed"] > len(report["errors"])
+    return report
+
+
 @router.put(
     "/{post_id}",
     response_model=PostPublic,
@@ -218,10 +488,16 @@ def update_post(post_id: int, data: PostUpdate, db: Session = Depends(get_db), _
     
     try:
         updates = data.model_dump(exclude_unset=True)
+        if updates.get("image_url") and not claim_media(db, updates["image_url"]):
+            raise HTTPException(status_code=422, detail="image_url does not match any uploaded media")
         post = repository.update_post(post, updates)
         db.commit()
-        db.refresh(post)
-        return post
+        post_cache.invalidate(("post", post_id))
+        return repository.get(post_id)
+    except StaleDataError:
+        # the version column moved: someone else saved this post since we read it
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Post was modified by another request, reload it and retry")
     except SQLAlchemyError:
         db.rollback()
         raise HTTPException(status_code=500, detail="Error DB updating post")
@@ -232,27 +508,29 @@ def update_post(post_id: int, data: PostUpdate, db: Session = Depends(get_db), _
 @router.delete("/{post_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_post(post_id: int, db: Session = Depends(get_db), _admin: User = Depends(require_admin)):
     repository = PostRepository(db)
-    post = repository.get(post_id)#se obtiene el post a eliminar
+    post = repository.get(post_id, "post_write")#se obtiene el post a eliminar
     if not post:
         raise HTTPException(status_code=404, detail="Post not found") #si no se encuentra el post se lanza una excepcion
     
     try:
         repository.delete_post(post) #se elimina el post
         db.commit() #se confirma la eliminacion
+        post_cache.invalidate(("post", post_id))
+    except StaleDataError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Post was modified by another request, reload it and retry")
     except SQLAlchemyError:
         db.rollback()
         raise HTTPException(status_code=500, detail="Error DB deleting post")
     
 
 @router.get("/post/{slug}", response_model=Union[PostPublic, PostSummary])
-def post_by_slug(slug: str, include_content: bool = Query(default=True, description="include content or not"), db: Session = Depends(get_db)):
-    repository = PostRepository(db)
-    post = repository.get_by_slug(slug)
-    
-    if not post:
-        raise HTTPException(status_code=404, detail="Post not found")
-        
-    if include_content:
-        return PostPublic.model_validate(post, from_attributes=True)
+async def post_by_slug(request: Request, slug: str, include_content: bool = Query(default=True, description="include content or not"), fields: Optional[str] = FIELDS_QUERY, db: AsyncDB = Depends(get_async_read_db)):
+    repository = AsyncPostRepository(db)
+    fields = parse_fields(fields)
+    return await read_post(request, repository, ("slug", slug, include_content, fields), include_content, fields, slug=slug)
+
 
-    return PostSummary.model_validate(post, from_attributes=True)
\ No newline at end of file
+@router.get("/cache/stats")
+def post_cache_stats(_admin: User = Depends(require_admin)):
+    return post_cache.stats()
\ No newline at end of file
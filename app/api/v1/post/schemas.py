@@ -1,13 +1,30 @@
 from calendar import c
-from typing import List, Optional, Literal, Annotated
+from functools import lru_cache
+from typing import List, Optional, Literal, Annotated, Tuple
 from fastapi import Form
-from pydantic import BaseModel, ConfigDict, Field, field_validator, EmailStr
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ConfigDict, Field, create_model, field_validator, EmailStr, ValidationError, ValidationInfo
 
 from app.api.v1.auth.schemas import UserPublic
 from app.api.v1.categories.schemas import CategoryPublic
+from app.core.config import settings
+from app.services.file_storage import CONTENT_PATH
+from app.utils.word_filter import WordFilter, load_words
 from .words import words
 
 
+prohibited = WordFilter(load_words(settings.PROHIBITED_WORDS_FILE, words))
+
+
+def check_prohibited(value: Optional[str], info: ValidationInfo) -> Optional[str]:
+    if value is None:
+        return value
+    hits = prohibited.find_all(value)
+    if hits:
+        found = ", ".join(f"'{hit}'" for hit in hits)
+        raise ValueError(f"The {info.field_name} contains prohibited words: {found}")
+    return value
+
 
 
 class Tag(BaseModel):
@@ -67,14 +84,10 @@ class PostCreate(BaseModel):
     tags: List[Tag] = Field(default_factory=list)  # []
     # author: Optional[Autor] = None
 
-    @field_validator("title")
+    @field_validator("title", "content")
     @classmethod
-    def not_allowed_title(cls, value: str) -> str:
-        lower_value = value.lower()
-        for word in words:
-            if word in lower_value:
-                raise ValueError(f"The title contains a prohibited word: '{word}'")
-        return value
+    def not_allowed_title(cls, value: str, info: ValidationInfo) -> str:
+        return check_prohibited(value, info)
     
     @classmethod
     def as_form(
@@ -86,8 +99,11 @@ class PostCreate(BaseModel):
         
         
     ):
-        tag_objs = [Tag(name=t) for t in (tags or [])]
-        return cls(title=title, content=content, category_id=category_id, tags=tag_objs)
+        try:
+            tag_objs = [Tag(name=t) for t in (tags or [])]
+            return cls(title=title, content=content, category_id=category_id, tags=tag_objs)
+        except ValidationError as e:
+            raise RequestValidationError(e.errors(include_url=False, include_context=False))
 
 
 class PostUpdate(BaseModel):
@@ -99,6 +115,20 @@ class PostUpdate(BaseModel):
         example="My first blog post",
     )
     content: Optional[str] = None
+    image_url: Optional[str] = Field(None, max_length=300, description="URL returned by /uploads/save, null removes the image")
+
+    @field_validator("title", "content")
+    @classmethod
+    def not_allowed_title(cls, value: Optional[str], info: ValidationInfo) -> Optional[str]:
+        return check_prohibited(value, info)
+
+    @field_validator("image_url")
+    @classmethod
+    def media_url(cls, value: Optional[str]) -> Optional[str]:
+        # only our own blobs: whether that blob exists is checked against the media table on update
+        if value is not None and not (value.startswith("/media/") and CONTENT_PATH.match(value.removeprefix("/media/"))):
+            raise ValueError("image_url must be a URL returned by /uploads/save")
+        return value
 
 
 class PostPublic(Post):
@@ -108,6 +138,20 @@ class PostPublic(Post):
     model_config = ConfigDict(from_attributes=True)
 
 
+# fields a client can ask for with ?fields=, in the order PostPublic renders them
+POST_FIELDS = tuple(PostPublic.model_fields)
+
+
+@lru_cache(maxsize=None)
+def post_fields_model(fields: Tuple[str, ...]) -> type[BaseModel]:
+    """PostPublic restricted to `fields`, it only reads the attributes the sparse query loaded."""
+    return create_model(
+        "PostFields",
+        __config__=ConfigDict(from_attributes=True),
+        **{name: (info.annotation, info) for name, info in PostPublic.model_fields.items() if name in fields},
+    )
+
+
 class PostSummary(BaseModel):
     id: int
     title: str
@@ -115,14 +159,16 @@ class PostSummary(BaseModel):
     model_config = ConfigDict(from_attributes=True)
     
 class PaginatedPosts(BaseModel):
-    page: int
+    page: Optional[int] = None
     per_page: int
-    total: int
-    total_pages: int
+    total: Optional[int] = None
+    total_pages: Optional[int] = None
     has_prev: bool
     has_next: bool
-    order_by: Literal["id", "title"]
+    order_by: Literal["id", "title", "relevance"]
     direction: Literal["asc", "desc"]
     search: Optional[str] = None
+    count_mode: Literal["exact", "cached", "estimated", "skip"] = "exact"
+    next_cursor: Optional[str] = None
     items : List[PostPublic]
     
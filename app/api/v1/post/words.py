@@ -145,7 +145,6 @@ words = [
     "franchise scam",
     "multi-level marketing scam",
     "network marketing scam",
-    "pyramid scheme",
     "work-from-home scam",
     "online business scam",
     "internet marketing scam",
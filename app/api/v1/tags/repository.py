@@ -1,11 +1,14 @@
 
-from typing import Optional
-from sqlalchemy import select, func
+from typing import Iterable, List, Optional
+from sqlalchemy import delete, insert, select, func
+from sqlalchemy.dialects import postgresql, sqlite
 from app.api.v1.tags.schemas import TagPublic
 from app.models import TagORM
 from sqlalchemy.orm import Session
 from app.models.post import PostORM, post_tags
-from app.services.pagination import paginated_query
+from app.models.profiles import with_profile
+from app.core.db import AsyncRepository
+from app.services.pagination import CountMode, mark_written, paginated_query
 
 class TagRepository:
     
@@ -14,7 +17,7 @@ class TagRepository:
         
         
     def get(self, tag_id: int) -> Optional[TagORM]:
-        tag_find = select(TagORM).where(TagORM.id == tag_id)
+        tag_find = with_profile(select(TagORM), "tag_only").where(TagORM.id == tag_id)
         return self.db.execute(tag_find).scalar_one_or_none()
             
         
@@ -26,8 +29,9 @@ class TagRepository:
         direction: str = 'asc',
         page: int = 1,
         per_page: int = 10, 
+        count: CountMode = "exact",
         ): 
-        query = select(TagORM)
+        query = with_profile(select(TagORM), "tag_only")
         if search:
             query = query.where(func.lower(TagORM.name).ilike(f"%{search.lower()}%"))
             
@@ -46,6 +50,7 @@ class TagRepository:
             order_by=order_by,
             direction=direction,
             alowed_order=allowed_order,
+            count=count,
         )
         
         result['items'] = [TagPublic.model_validate(item) for item in result['items']]
@@ -53,19 +58,44 @@ class TagRepository:
         return result
             
             
-    def create_tag(self, name: str):
-        normalize = name.strip().lower()
-        tag_obj = self.db.execute(select(TagORM).where(func.lower(TagORM.name) == normalize)).scalar_one_or_none() # para SQLite
-        # tag_obj = self.db.execute(select(TagORM).where(TagORM.name.ilike(name))).scalar_one_or_none() // para Postgres
+    def _insert_missing(self, names: List[str]) -> None:
+        dialect = self.db.get_bind().dialect.name
+        rows = [{"name": name} for name in names]
+        
+        # ON CONFLICT DO NOTHING: a concurrent create of the same tag is simply picked up by the next select
+        if dialect == "sqlite":
+            self.db.execute(sqlite.insert(TagORM).values(rows).on_conflict_do_nothing(index_elements=["name"]))
+        elif dialect == "postgresql":
+            self.db.execute(postgresql.insert(TagORM).values(rows).on_conflict_do_nothing(index_elements=["name"]))
+        else:
+            self.db.execute(insert(TagORM), rows)
+        mark_written(self.db, TagORM.__tablename__)
+    
+    
+    def ensure_tags(self, names: Iterable[str]) -> List[TagORM]:
+        """Tags for `names` (matched case-insensitively, in the given order), creating the missing ones
+        as spelled in one bulk insert."""
+        wanted = {}
+        for name in names:
+            if name.strip():
+                wanted.setdefault(name.strip().lower(), name.strip())
+        if not wanted:
+            return []
         
-        if tag_obj:
-            return tag_obj
+        query = with_profile(select(TagORM), "tag_only").where(func.lower(TagORM.name).in_(list(wanted)))
+        found = {tag.name.lower(): tag for tag in self.db.execute(query).scalars()}
         
-        tag_obj = TagORM(name=name)
-        self.db.add(tag_obj)
-        self.db.flush()
+        missing = [key for key in wanted if key not in found]
+        if missing:
+            self._insert_missing([wanted[key] for key in missing])
+            query = with_profile(select(TagORM), "tag_only").where(func.lower(TagORM.name).in_(missing))
+            found.update((tag.name.lower(), tag) for tag in self.db.execute(query).scalars())
         
-        return tag_obj
+        return [found[key] for key in wanted]
+            
+            
+    def create_tag(self, name: str):
+        return self.ensure_tags([name])[0]
     
     
     def update(self, tag_id: int, name: str) -> Optional[TagORM]:
@@ -88,7 +118,10 @@ class TagRepository:
         if not tag:
             return False
         
+        # links go explicitly, deleting the tag never loads the posts behind it
+        self.db.execute(delete(post_tags).where(post_tags.c.tag_id == tag_id))
         self.db.delete(tag)
+        mark_written(self.db, post_tags.name)
         return True
         
     def most_popular(self) -> dict | None:
@@ -108,4 +141,12 @@ class TagRepository:
             .mappings() #diccionario
             .first()
         )
-        return dict(row) if row else None
\ No newline at end of file
+        return dict(row) if row else None
+
+
+class AsyncTagRepository(AsyncRepository):
+    async def get(self, tag_id: int) -> Optional[TagORM]:
+        return await self.db.run(lambda session: TagRepository(session).get(tag_id))
+
+    async def list_tags(self, **kwargs) -> dict:
+        return await self.db.run(lambda session: TagRepository(session).list_tags(**kwargs))
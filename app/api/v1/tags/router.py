@@ -1,10 +1,15 @@
 from annotated_types import T
 from fastapi import Query
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
-from app.api.v1.tags.repository import TagRepository
-from app.core.db import get_db
+from sqlalchemy.orm.exc import StaleDataError
+from app.api.v1.tags.repository import AsyncTagRepository, TagRepository
+from app.core.db import AsyncDB, get_async_read_db, get_db, get_read_db
+from app.services.cache import post_cache
+from app.services.pagination import CountMode
+from app.services.etag import conditional, make_etag, table_versions
+from app.models import TagORM
 
 from app.api.v1.tags.schemas import TagCreate, TagPublic, TagUpdate
 from app.core.security import get_current_user, require_admin, require_editor, require_user
@@ -13,23 +18,32 @@ from app.models.user import User
 router = APIRouter(prefix="/tags", tags=["tags"])
 
 @router.get('', response_model=dict)
-def list_tags(
+async def list_tags(
+    request: Request,
+    response: Response,
     page: int = Query(1, ge=1),
     per_page: int = Query(10, ge=1, le=100),
     oder_by: str = Query('id', pattern=r'^(id|name)'),
     direction: str = Query('asc', pattern=r'^(asc|desc)'),
     search: str | None = Query(None),
-    db: Session = Depends(get_db),
+    count: CountMode = Query('exact', description="exact, cached, estimated or skip"),
+    db: AsyncDB = Depends(get_async_read_db),
     
 ):
     
-    repository = TagRepository(db)
-    return repository.list_tags(
+    etag = make_etag("tags", await db.run(table_versions, TagORM.__tablename__), page, per_page, oder_by, direction, search, count)
+    unchanged = conditional(request, response, etag)
+    if unchanged:
+        return unchanged
+    
+    repository = AsyncTagRepository(db)
+    return await repository.list_tags(
         page=page,
         per_page=per_page,
         order_by=oder_by,
         direction=direction,
         search=search,
+        count=count,
     )
 
 @router.post('', response_model=TagPublic, response_description="POST created successfully(okay)", status_code=status.HTTP_201_CREATED)
@@ -58,7 +72,11 @@ def update_tag(
             raise HTTPException(status_code=404, detail="Tag not found")
         
         db.commit()
+        post_cache.invalidate(("tag", tag_id))
         return TagPublic.model_validate(tag_updated)
+    except StaleDataError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Tag was modified by another request, reload it and retry")
     except SQLAlchemyError:
         db.rollback()
         raise HTTPException(status_code=500, detail="Error DB updating tag")
@@ -75,14 +93,18 @@ def delete_tag(
         if not tag_deleted:
             raise HTTPException(status_code=404, detail="Tag not found")
         db.commit()
+        post_cache.invalidate(("tag", tag_id))
         return None
+    except StaleDataError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Tag was modified by another request, reload it and retry")
     except SQLAlchemyError:
         db.rollback()
         raise HTTPException(status_code=500, detail="Error DB deleting tag")
 
 @router.get('/popular/top')
 def get_most_popular(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     user = Depends(get_current_user)
 ):
     repository = TagRepository(db)
@@ -0,0 +1,107 @@
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import TYPE_CHECKING, Optional
+
+from app.core.config import settings
+
+if TYPE_CHECKING:
+    from app.core.query_stats import QueryStats
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            **record.access,
+        }
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Never waits: a full queue drops the record (and counts it) instead of stalling the event loop."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # formatting happens on the listener thread, not on the request path
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _output_handler() -> logging.Handler:
+    if settings.ACCESS_LOG_FILE:
+        handler = logging.FileHandler(settings.ACCESS_LOG_FILE, encoding="utf-8")
+    else:
+        handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JsonFormatter())
+    return handler
+
+
+logger = logging.getLogger("blog_api.access")
+logger.setLevel(settings.ACCESS_LOG_LEVEL.upper())
+logger.propagate = False
+
+queue_handler = DroppingQueueHandler(queue.Queue(maxsize=settings.ACCESS_LOG_QUEUE_SIZE))
+logger.addHandler(queue_handler)
+listener = QueueListener(queue_handler.queue, _output_handler(), respect_handler_level=True)
+listener.start()
+atexit.register(listener.stop)
+
+
+def log_request(
+    method: str,
+    path: str,
+    route: Optional[str],
+    status: int,
+    duration_ms: float,
+    request_id: Optional[str],
+    user_id: Optional[str],
+    client: Optional[str],
+    db: Optional["QueryStats"] = None,
+) -> None:
+    # 5xx always, 4xx and probable N+1 as warnings, successes sampled unless they were slow
+    n_plus_one = db.repeated(settings.SQL_N_PLUS_ONE_THRESHOLD) if db else []
+    over_budget = bool(db) and 0 < settings.SQL_QUERY_BUDGET < db.count
+    if status >= 500:
+        level = logging.ERROR
+    elif status >= 400 or n_plus_one or over_budget:
+        level = logging.WARNING
+    else:
+        level = logging.INFO
+    if not logger.isEnabledFor(level):
+        return
+    if level == logging.INFO and duration_ms < settings.ACCESS_LOG_SLOW_MS and random.random() >= settings.ACCESS_LOG_SAMPLE_RATE:
+        return
+
+    entry = {
+        "method": method,
+        "path": path,
+        "route": route,
+        "status": status,
+        "duration_ms": round(duration_ms, 2),
+        "request_id": request_id,
+        "user_id": user_id,
+        "client": client,
+    }
+    if db:
+        entry["db_queries"] = db.count
+        entry["db_time_ms"] = round(db.seconds * 1000, 2)
+        if n_plus_one:
+            entry["n_plus_one"] = n_plus_one
+        if over_budget:
+            entry["query_budget_exceeded"] = settings.SQL_QUERY_BUDGET
+    logger.log(level, "access", extra={"access": entry})
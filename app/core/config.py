@@ -3,4 +3,67 @@ class settings():
     
     JWT_SECRET: str = os.getenv("SECRET_KEY", "change_in_production")
     JWT_ALG: str = "HS256"
-    ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
\ No newline at end of file
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+    SEARCH_TS_CONFIG: str = os.getenv("SEARCH_TS_CONFIG", "simple")
+    PROHIBITED_WORDS_FILE: str | None = os.getenv("PROHIBITED_WORDS_FILE")
+    POST_CACHE_SIZE: int = int(os.getenv("POST_CACHE_SIZE", 1024))
+    POST_CACHE_TTL: float = float(os.getenv("POST_CACHE_TTL", 300))
+    COUNT_CACHE_SIZE: int = int(os.getenv("COUNT_CACHE_SIZE", 256))
+    COUNT_CACHE_TTL: float = float(os.getenv("COUNT_CACHE_TTL", 30))
+    DB_MODE: str = os.getenv("DB_MODE", "sync")  # sync | async
+    # SQLite profile, applied to every new connection
+    SQLITE_JOURNAL_MODE: str = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS: str = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+    SQLITE_CACHE_SIZE_KB: int = int(os.getenv("SQLITE_CACHE_SIZE_KB", 65536))
+    SQLITE_MMAP_SIZE: int = int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+    SQLITE_FOREIGN_KEYS: bool = os.getenv("SQLITE_FOREIGN_KEYS", "true").lower() in ("1", "true", "yes")
+    # connection pool (Postgres and file SQLite)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", 30))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", 1800))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+    DB_STATEMENT_TIMEOUT_MS: int = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 30000))
+    READ_AFTER_WRITE_SECONDS: float = float(os.getenv("READ_AFTER_WRITE_SECONDS", 5))
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+    PASSWORD_HASH_MAX_QUEUE: int = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", 64))
+    PASSWORD_HASH_EXECUTOR: str = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")  # thread | process
+    PRINCIPAL_CACHE_SIZE: int = int(os.getenv("PRINCIPAL_CACHE_SIZE", 4096))
+    PRINCIPAL_CACHE_TTL: float = float(os.getenv("PRINCIPAL_CACHE_TTL", 60))
+    # rate limiting: token buckets per IP, per user and per route (rate per second, burst)
+    RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+    RATE_LIMIT_STORE: str = os.getenv("RATE_LIMIT_STORE", "memory")  # memory | sqlite (shared by the workers of a host)
+    RATE_LIMIT_SQLITE_PATH: str = os.getenv("RATE_LIMIT_SQLITE_PATH", "/dev/shm/blog_api_ratelimit.db" if os.path.isdir("/dev/shm") else "./ratelimit.db")
+    RATE_LIMIT_MAX_KEYS: int = int(os.getenv("RATE_LIMIT_MAX_KEYS", 100_000))
+    RATE_LIMIT_IP_RATE: float = float(os.getenv("RATE_LIMIT_IP_RATE", 20))
+    RATE_LIMIT_IP_BURST: float = float(os.getenv("RATE_LIMIT_IP_BURST", 100))
+    RATE_LIMIT_USER_RATE: float = float(os.getenv("RATE_LIMIT_USER_RATE", 20))
+    RATE_LIMIT_USER_BURST: float = float(os.getenv("RATE_LIMIT_USER_BURST", 100))
+    RATE_LIMIT_AUTH_RATE: float = float(os.getenv("RATE_LIMIT_AUTH_RATE", 0.2))
+    RATE_LIMIT_AUTH_BURST: float = float(os.getenv("RATE_LIMIT_AUTH_BURST", 10))
+    RATE_LIMIT_TRUST_PROXY: bool = os.getenv("RATE_LIMIT_TRUST_PROXY", "false").lower() in ("1", "true", "yes")
+    RATE_LIMIT_TRUSTED_PROXIES: int = int(os.getenv("RATE_LIMIT_TRUSTED_PROXIES", 1))  # proxies in front of the app, each appends one X-Forwarded-For entry
+    IP_BLOCKLIST: str = os.getenv("IP_BLOCKLIST", "")  # comma separated addresses or CIDR ranges
+    # RequestMiddleware features
+    MIDDLEWARE_TIMING: bool = os.getenv("MIDDLEWARE_TIMING", "true").lower() in ("1", "true", "yes")
+    MIDDLEWARE_REQUEST_ID: bool = os.getenv("MIDDLEWARE_REQUEST_ID", "true").lower() in ("1", "true", "yes")
+    MIDDLEWARE_ACCESS_LOG: bool = os.getenv("MIDDLEWARE_ACCESS_LOG", "true").lower() in ("1", "true", "yes")
+    MIDDLEWARE_BLOCKING: bool = os.getenv("MIDDLEWARE_BLOCKING", "true").lower() in ("1", "true", "yes")
+    # structured JSON access log (queue-backed, written by a background thread)
+    ACCESS_LOG_LEVEL: str = os.getenv("ACCESS_LOG_LEVEL", "INFO")  # WARNING: only 4xx/5xx
+    ACCESS_LOG_SAMPLE_RATE: float = float(os.getenv("ACCESS_LOG_SAMPLE_RATE", 1.0))  # share of 2xx/3xx logged
+    ACCESS_LOG_SLOW_MS: float = float(os.getenv("ACCESS_LOG_SLOW_MS", 1000))  # slower requests are always logged
+    ACCESS_LOG_QUEUE_SIZE: int = int(os.getenv("ACCESS_LOG_QUEUE_SIZE", 10000))
+    ACCESS_LOG_FILE: str | None = os.getenv("ACCESS_LOG_FILE")  # stdout when unset
+    # Prometheus /metrics
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+    METRICS_BUCKETS: str = os.getenv("METRICS_BUCKETS", "0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10")  # seconds
+    METRICS_MULTIPROC_DIR: str | None = os.getenv("METRICS_MULTIPROC_DIR")  # shared by all workers of the host, unset: single process
+    METRICS_FLUSH_SECONDS: float = float(os.getenv("METRICS_FLUSH_SECONDS", 1.0))
+    # per-request SQL stats (X-DB-Queries / X-DB-Time headers and access log)
+    SQL_STATS_ENABLED: bool = os.getenv("SQL_STATS_ENABLED", "true").lower() in ("1", "true", "yes")
+    SQL_N_PLUS_ONE_THRESHOLD: int = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", 5))  # same statement this many times = probable N+1
+    SQL_QUERY_BUDGET: int = int(os.getenv("SQL_QUERY_BUDGET", 0))  # queries per request, 0 = no budget
+    SQL_QUERY_BUDGET_STRICT: bool = os.getenv("SQL_QUERY_BUDGET_STRICT", "false").lower() in ("1", "true", "yes")  # dev: fail the request past the budget
+    MEDIA_GC_GRACE_SECONDS: int = int(os.getenv("MEDIA_GC_GRACE_SECONDS", 3600))  # unreferenced blobs younger than this are kept (uploads not yet attached to a post)
\ No newline at end of file
@@ -1,29 +1,276 @@
+import asyncio
+from contextlib import contextmanager
+import itertools
 import os
-from sqlalchemy import create_engine
+import time
+import weakref
+from typing import TYPE_CHECKING, Any, Callable, Optional, Union
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, Session, DeclarativeBase
+from fastapi import Request, Response
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
 
 
 
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./blog.db")
+# read replicas, comma separated; GET handlers read from them through get_read_db
+READ_REPLICA_URLS = [url.strip() for url in os.getenv("READ_REPLICA_URLS", "").split(",") if url.strip()]
+
+
+
+def engine_options(url: str) -> dict:
+    """create_engine kwargs of the database profile: pool sizing and per-driver connect args, from env."""
+    options: dict = {"echo": False}
+    connect_args: dict = {}
+
+    if url.startswith("sqlite"):
+        if "aiosqlite" not in url:
+            connect_args["check_same_thread"] = False
+        if ":memory:" in url or url.split("://", 1)[1] in ("", "/"):
+            # in-memory databases live in a single connection, no pool to size
+            return {**options, "connect_args": connect_args}
+    else:
+        options["pool_pre_ping"] = settings.DB_POOL_PRE_PING
+        options["pool_recycle"] = settings.DB_POOL_RECYCLE
+        if url.startswith("postgres") and settings.DB_STATEMENT_TIMEOUT_MS:
+            timeout = str(settings.DB_STATEMENT_TIMEOUT_MS)
+            if "asyncpg" in url:
+                connect_args["server_settings"] = {"statement_timeout": timeout}
+            else:
+                connect_args["options"] = f"-c statement_timeout={timeout}"
+
+    options.update(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        connect_args=connect_args,
+    )
+    return options
+
 
+def apply_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    # WAL lets readers run alongside the writer, foreign_keys makes the ON DELETE clauses
+    # (post_tags cascade, category SET NULL) actually run, SQLite leaves them off by default
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.execute(f"PRAGMA cache_size={-int(settings.SQLITE_CACHE_SIZE_KB)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+    cursor.execute(f"PRAGMA foreign_keys={'ON' if settings.SQLITE_FOREIGN_KEYS else 'OFF'}")
+    cursor.close()
 
 
-engine_kwargs = {}
-if DATABASE_URL.startswith("sqlite"):
-    engine_kwargs["connect_args"] = {"check_same_thread": False}
-    
-engine = create_engine(DATABASE_URL, echo=False, future=True, **engine_kwargs)
+def make_engine(url: str):
+    db_engine = create_engine(url, future=True, **engine_options(url))
+    if db_engine.dialect.name == "sqlite":
+        event.listen(db_engine, "connect", apply_sqlite_pragmas)
+    return db_engine
 
+
+engine = make_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, class_=Session)
 
+read_engines = [make_engine(url) for url in READ_REPLICA_URLS]
+ReadSessionLocals = [sessionmaker(autocommit=False, autoflush=False, bind=db_engine, class_=Session) for db_engine in read_engines]
+
+
+def async_database_url(url: str) -> str:
+    # the same database through the asyncio drivers
+    scheme, rest = url.split(":", 1)
+    if scheme.startswith("sqlite"):
+        return "sqlite+aiosqlite:" + rest
+    if scheme.startswith(("postgresql", "postgres")):
+        return "postgresql+asyncpg:" + rest
+    return url
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or async_database_url(DATABASE_URL)
+
+# DB_MODE=async: async handlers talk to the database through create_async_engine (aiosqlite/asyncpg)
+# instead of borrowing a threadpool slot per call. The sync engine stays for startup and sync routes.
+async_engine = None
+AsyncSessionLocal = None
+AsyncReadSessionLocals = []
+if settings.DB_MODE == "async":
+    # imported here, the async drivers and greenlet are only required in async mode
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    def make_async_engine(url: str):
+        db_engine = create_async_engine(url, **engine_options(url))
+        if db_engine.dialect.name == "sqlite":
+            event.listen(db_engine.sync_engine, "connect", apply_sqlite_pragmas)
+        return db_engine
+
+    async_engine = make_async_engine(ASYNC_DATABASE_URL)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    AsyncReadSessionLocals = [
+        async_sessionmaker(make_async_engine(async_database_url(url)), autoflush=False, expire_on_commit=False)
+        for url in READ_REPLICA_URLS
+    ]
+
 
 class Base(DeclarativeBase):
     pass
 
-def get_db():
+
+# read-your-writes: a client that committed a write reads from the primary until the cookie
+# expires, replicas get READ_AFTER_WRITE_SECONDS to catch up
+STICKY_COOKIE = "db_primary_until"
+last_write_at = 0.0
+_next_replica = itertools.count()
+
+
+def _stick_to_primary(session: Session, response: Response) -> None:
+    def after_commit(session):
+        global last_write_at
+        last_write_at = time.time()
+        until = last_write_at + settings.READ_AFTER_WRITE_SECONDS
+        response.set_cookie(STICKY_COOKIE, f"{until:.3f}", max_age=max(1, int(settings.READ_AFTER_WRITE_SECONDS) + 1), httponly=True, samesite="lax")
+
+    event.listen(session, "after_commit", after_commit)
+
+
+def read_from_primary(request: Request) -> bool:
+    if not READ_REPLICA_URLS:
+        return True
+    try:
+        return float(request.cookies.get(STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def replicas_may_lag() -> bool:
+    # replica reads right after any write may be stale, they must not fill process-wide caches
+    return time.time() - last_write_at < settings.READ_AFTER_WRITE_SECONDS
+
+
+def get_db(response: Response):
     db = SessionLocal()
+    if READ_REPLICA_URLS:
+        _stick_to_primary(db, response)
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_read_db(request: Request):
+    """Session for read-only handlers: a replica (round robin) unless the client wrote recently."""
+    if read_from_primary(request):
+        db = SessionLocal()
+    else:
+        db = ReadSessionLocals[next(_next_replica) % len(ReadSessionLocals)]()
+        db.info["replica"] = True
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+read_session = contextmanager(get_read_db)
+
+
+class AsyncDB:
+    """Database handle for async handlers, the same in both modes.
+
+    `await db.run(fn, *args)` calls `fn(session, *args)` with a sync Session: through
+    AsyncSession.run_sync in async mode (on the event loop, no thread), in the threadpool
+    otherwise, so the repositories keep a single implementation of every query.
+    """
+
+    def __init__(self, session: Union[Session, "AsyncSession"], replica: bool = False, slots: Optional[asyncio.Semaphore] = None):
+        self.session = session
+        self.is_async = not isinstance(session, Session)
+        self.replica = replica
+        self._slots = slots
+        self._holding_slot = False
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        if self.is_async:
+            return await self.session.run_sync(fn, *args, **kwargs)
+        if self._slots is not None and not self._holding_slot:
+            await self._slots.acquire()
+            self._holding_slot = True
+        return await run_in_threadpool(fn, self.session, *args, **kwargs)
+
+    async def close(self) -> None:
+        """Give the connection back before slow non-DB work, loaded objects stay readable."""
+        if self.is_async:
+            await self.session.close()
+            return
+        try:
+            await run_in_threadpool(self.session.close)
+        finally:
+            if self._holding_slot:
+                self._holding_slot = False
+                self._slots.release()
+
+    async def commit(self) -> None:
+        if self.is_async:
+            await self.session.commit()
+        else:
+            await run_in_threadpool(self.session.commit)
+
+    async def rollback(self) -> None:
+        if self.is_async:
+            await self.session.rollback()
+        else:
+            await run_in_threadpool(self.session.rollback)
+
+
+class AsyncRepository:
+    """Base of the Async*Repository classes: the read side of a sync repository for async
+    handlers, every method runs that repository's query through `db.run`."""
+
+    def __init__(self, db: AsyncDB) -> None:
+        self.db = db
+
+
+# per event loop, then per engine: a semaphore belongs to the loop it was first awaited on,
+# and a worker (or a test client) may run more than one loop over its lifetime
+_session_slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]" = weakref.WeakKeyDictionary()
+
+
+def _sync_session_slots(db_engine) -> asyncio.Semaphore:
+    # a sync session keeps its connection between awaits, so at most pool capacity of them may be
+    # in use: the rest wait here on the event loop instead of blocking threadpool threads on checkout
+    slots = _session_slots.setdefault(asyncio.get_running_loop(), {})
+    if db_engine not in slots:
+        pool = db_engine.pool
+        capacity = pool.size() + max(getattr(pool, "_max_overflow", 0), 0) if hasattr(pool, "size") else 1
+        slots[db_engine] = asyncio.Semaphore(capacity)
+    return slots[db_engine]
+
+
+async def _async_session(factory, replica: bool = False):
+    if settings.DB_MODE == "async":
+        async with factory() as session:
+            yield AsyncDB(session, replica)
+        return
+
+    db = AsyncDB(factory(), replica, _sync_session_slots(factory.kw["bind"]))
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
+async def get_async_db():
+    async for db in _async_session(AsyncSessionLocal or SessionLocal):
+        yield db
+
+
+async def get_async_read_db(request: Request):
+    if read_from_primary(request):
+        factories, replica = [AsyncSessionLocal or SessionLocal], False
+    else:
+        factories, replica = AsyncReadSessionLocals or ReadSessionLocals, True
+    async for db in _async_session(factories[next(_next_replica) % len(factories)], replica):
+        yield db
@@ -1,12 +1,156 @@
 
 import time
-from urllib import response
 import uuid
-from fastapi import FastAPI, HTTPException, Request
+from math import ceil
+from typing import Optional
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
+from starlette.routing import Mount
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from jwt.exceptions import PyJWTError
 
+from app.core.access_log import log_request
+from app.core.config import settings
+from app.core.query_stats import QueryStats, current_stats
+from app.core.security import decode_token
+from app.services.metrics import metrics as request_metrics
+from app.services.rate_limit import blocklist, limiter
+
+
+def client_ip(request: Request) -> str:
+    if settings.RATE_LIMIT_TRUST_PROXY:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            # the client writes whatever it wants on the left, only the entries our own proxies
+            # appended can be trusted: the one N hops from the right is the address they saw
+            hops = [entry.strip() for entry in forwarded.split(",")]
+            return hops[-min(max(settings.RATE_LIMIT_TRUSTED_PROXIES, 1), len(hops))]
+    return request.client.host if request.client else "unknown"
+
+
+def token_subject(request: Request) -> str | None:
+    # only to pick the user's bucket, a bad token is just anonymous here (the route rejects it)
+    authorization = request.headers.get("authorization", "")
+    if not authorization.lower().startswith("bearer "):
+        return None
+    try:
+        return decode_token(authorization[7:]).get("sub")
+    except PyJWTError:
+        return None
+
+
+def route_template(scope: Scope) -> Optional[str]:
+    """Matched path template ("/posts/{post_id}"), low cardinality for logs and metrics."""
+    route = scope.get("route")
+    template = getattr(route, "path_format", None) or getattr(route, "path", None)
+    if not template:
+        return None
+    if isinstance(route, Mount):
+        return template + "/{path}"
+    # a route of an included router may only know its own path, the prefix is what precedes it in the URL
+    inner = template.strip("/").split("/")
+    outer = scope["path"].strip("/").split("/")
+    prefix = outer[: max(0, len(outer) - len(inner))]
+    return "/" + "/".join(prefix + inner)
+
+
+class RequestMiddleware:
+    """Timing, request id, SQL stats, access log, metrics and blocking (blocklist + rate limits) in one pure-ASGI pass.
+
+    No BaseHTTPMiddleware task per layer and no response wrapping: the only thing touched on the
+    way out is the http.response.start message, streaming bodies go straight through.
+    """
+
+    def __init__(self, app: ASGIApp, timing: bool = True, request_id: bool = True, access_log: bool = True, blocking: bool = True, metrics: bool = True, sql_stats: bool = True):
+        self.app = app
+        self.timing = timing
+        self.request_id = request_id
+        self.access_log = access_log
+        self.blocking = blocking
+        self.metrics = metrics
+        self.sql_stats = sql_stats
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        request = Request(scope)
+        request_id = None
+        if self.request_id:
+            # honour the caller's id (proxy, another service) so one id follows the request everywhere
+            incoming = request.headers.get("x-request-id", "")
+            request_id = incoming if 0 < len(incoming) <= 128 and incoming.isprintable() else str(uuid.uuid4())
+            scope.setdefault("state", {})["request_id"] = request_id
+        ip = client_ip(request)
+        user_id = token_subject(request) if self.access_log or self.blocking else None
+
+        status_code = 500
+        if self.metrics:
+            request_metrics.request_started()
+            request_metrics.sample_threadpool()
+        stats = QueryStats() if self.sql_stats else None
+        stats_token = current_stats.set(stats) if stats else None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                if self.timing:
+                    headers.append("X-Process-Time", f"{time.perf_counter() - start:.4f} s")
+                if request_id:
+                    headers.append("X-Request-Id", request_id)
+                if stats:
+                    # queries so far: a streaming body may still run more, the access log has the final count
+                    headers.append("X-DB-Queries", str(stats.count))
+                    headers.append("X-DB-Time", f"{stats.seconds * 1000:.2f} ms")
+            await send(message)
+
+        try:
+            rejection = await self.check(request, ip, user_id) if self.blocking else None
+            await (rejection or self.app)(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            if stats_token:
+                current_stats.reset(stats_token)
+            route = route_template(scope) if self.access_log or self.metrics else None
+            if self.metrics:
+                request_metrics.request_finished(request.method, route, status_code, duration)
+            if self.access_log:
+                log_request(
+                    method=request.method,
+                    path=request.url.path,
+                    route=route,
+                    status=status_code,
+                    duration_ms=duration * 1000,
+                    request_id=request_id,
+                    user_id=user_id,
+                    client=ip,
+                    db=stats,
+                )
+
+    async def check(self, request: Request, ip: str, user_id: Optional[str]) -> Optional[Response]:
+        if ip in blocklist:
+            return JSONResponse(status_code=403, content={"detail": "Forbidden no access"})
+        
+        if settings.RATE_LIMIT_ENABLED and request.method != "OPTIONS":
+            args = (ip, user_id, request.method, request.url.path)
+            if limiter.store.blocking:
+                allowed, retry_after = await run_in_threadpool(limiter.check, *args)
+            else:
+                allowed, retry_after = limiter.check(*args)
+            if not allowed:
+                return JSONResponse(
+                    status_code=429,
+                    content={"detail": "Too many requests"},
+                    headers={"Retry-After": str(max(1, ceil(retry_after)))},
+                )
+        return None
 
-BLACKLIST = {}
 
 def register_middleware(app: FastAPI):
     
@@ -19,37 +163,13 @@ def register_middleware(app: FastAPI):
         
     )
     
-    
-    @app.middleware("http")
-    async def add_process_time_header(request: Request, call_next):
-        start = time.perf_counter()
-        response = await call_next(request)
-        process_time = time.perf_counter() - start
-        response.headers["X-Process-Time"] = f'{process_time:.4f} s'
-        return response
-    
-    
-    @app.middleware("http")
-    async def log_request(request: Request, call_next):
-        print(f"***Request***: {request.method} {request.url}")
-        response = await call_next(request)
-        print(f"***Response***: {response.status_code} **")
-        return response
-    
-    
-    @app.middleware("http")
-    async def add_request_id_header(request: Request, call_next):
-        request_id = str(uuid.uuid4())
-        response = await call_next(request)
-        response.headers["X-Request-Id"] = request_id
-        return response
-    
-    
-    @app.middleware("http")
-    async def block_ip_middleware(request: Request, call_next):
-        client_ip = request.client.host
-        if client_ip in BLACKLIST:
-            raise HTTPException(status_code=403, detail="Forbidden no access")
-        return await call_next(request)
-       
-    
\ No newline at end of file
+    # added last so it runs first: blocked clients never reach CORS or the routes
+    app.add_middleware(
+        RequestMiddleware,
+        timing=settings.MIDDLEWARE_TIMING,
+        request_id=settings.MIDDLEWARE_REQUEST_ID,
+        access_log=settings.MIDDLEWARE_ACCESS_LOG,
+        blocking=settings.MIDDLEWARE_BLOCKING,
+        metrics=settings.METRICS_ENABLED,
+        sql_stats=settings.SQL_STATS_ENABLED,
+    )
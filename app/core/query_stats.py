@@ -0,0 +1,72 @@
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import List, Optional
+from fastapi import HTTPException, status
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+
+
+# "IN (?, ?, ?)" and "IN (?)" are the same query, only the list length changes
+_PLACEHOLDER_LIST = re.compile(r"\(\s*(?:\?|%s|%\(\w+\)s|\$\d+|:\w+)(?:\s*,\s*(?:\?|%s|%\(\w+\)s|\$\d+|:\w+))*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    return _PLACEHOLDER_LIST.sub("(?)", _WHITESPACE.sub(" ", statement).strip())
+
+
+class QueryStats:
+    """Queries run on behalf of one request: count, time spent in the database and repeated shapes."""
+
+    __slots__ = ("count", "seconds", "shapes")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes: Counter = Counter()
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.seconds += seconds
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self, threshold: int) -> List[dict]:
+        """Shapes run at least `threshold` times: one query per row of something, a probable N+1."""
+        return [
+            {"statement": shape[:300], "count": count}
+            for shape, count in self.shapes.most_common()
+            if count >= threshold
+        ]
+
+
+# set by RequestMiddleware; run_in_threadpool and run_sync copy the context, so the
+# repositories' queries land on the stats of the request that made them
+current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_stats.get()
+    if stats is None:
+        return  # startup, seeds, scripts
+    if settings.SQL_QUERY_BUDGET_STRICT and 0 < settings.SQL_QUERY_BUDGET <= stats.count:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Query budget exceeded: more than {settings.SQL_QUERY_BUDGET} queries in one request "
+                   f"(most repeated: {stats.shapes.most_common(1)[0][0][:200]})",
+        )
+    if context is not None:
+        context._query_started = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_stats.get()
+    if stats is None:
+        return
+    started = getattr(context, "_query_started", None)
+    stats.record(statement, time.perf_counter() - started if started is not None else 0.0)
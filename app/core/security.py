@@ -1,15 +1,19 @@
 from operator import inv
 import os
 import token
+from dataclasses import dataclass
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from datetime import datetime, timedelta, timezone
 from typing import Literal, Optional
-from pwdlib import PasswordHash
-from sqlalchemy.orm import Session
-from app.api.v1.auth.repository import UserRepository
+from sqlalchemy import event
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session, object_session
+from app.api.v1.auth.repository import AsyncUserRepository
 from app.core.config import settings
-from app.core.db import get_db
+from app.core.db import AsyncDB, get_async_db, get_db
+from app.services.cache import principal_cache
+from app.services.password_pool import _hash, _verify, password_pool
 
 
 
@@ -18,7 +22,6 @@ from jwt.exceptions import ExpiredSignatureError, InvalidTokenError, PyJWTError
 
 from app.models.user import User
 
-password_hash = PasswordHash.recommended()
 outh2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/token")
 
 credentials_exception = HTTPException(
@@ -57,13 +60,51 @@ def decode_token(token: str) -> dict:
 #     token = jwt.encode(payload=to_encode, key=settings.JWT_SECRET, algorithm=settings.JWT_ALG)
 #     return token
 
-def create_access_token(sub: str, minutes: int | None = None) -> str:
+def create_access_token(sub: str, minutes: int | None = None, version: int | None = None) -> str:
     expire = datetime.now(timezone.utc) + timedelta(minutes=minutes or settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    return  jwt.encode({"sub": sub, "exp": expire}, key=settings.JWT_SECRET, algorithm=settings.JWT_ALG)
-    
+    claims = {"sub": sub, "exp": expire}
+    if version is not None:
+        claims["ver"] = version
+    return  jwt.encode(claims, key=settings.JWT_SECRET, algorithm=settings.JWT_ALG)
+
+
+@dataclass(frozen=True)
+class Principal:
+    """What authorization needs from a user, cheap to cache and safe to share between requests."""
+    id: int
+    email: str
+    full_name: Optional[str]
+    role: str
+    is_active: bool
+    version: int
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(user.id, user.email, user.full_name, user.role, user.is_active, user.version)
+
+
+# a committed change to a user (role, deactivation...) drops its cached principals in this process,
+# other workers pick it up when their entry expires (PRINCIPAL_CACHE_TTL)
+@event.listens_for(User, "after_update")
+def _user_changed(mapper, connection, target: User) -> None:
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("changed_users", set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _drop_changed_principals(session: Session) -> None:
+    changed = session.info.pop("changed_users", ())
+    if changed:
+        principal_cache.invalidate(*(("user", user_id) for user_id in changed))
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_principals(session: Session) -> None:
+    session.info.pop("changed_users", None)
     
 
-async def get_current_user(db: Session = Depends(get_db), token: str = Depends(outh2_scheme)) -> User:
+async def get_current_user(db: Session = Depends(get_db), token: str = Depends(outh2_scheme)) -> Principal:
     
     try:
         payload = decode_token(token)
@@ -79,34 +120,52 @@ async def get_current_user(db: Session = Depends(get_db), token: str = Depends(o
     except PyJWTError:
         raise invalid_credentials()
     
-    user = db.get(User, user_id)
+    # tokens carry the user version (bumped on role changes): a known (user, version) authorizes without touching the DB.
+    # a new version (role change) misses on every worker, older tokens see it within the TTL
+    key = (user_id, payload.get("ver"))
+    principal = principal_cache.get(key)
+    if principal is not None:
+        return principal
+
+    generation = principal_cache.generation
+    user = await run_in_threadpool(db.get, User, user_id)
     if not user or not user.is_active:
         raise invalid_credentials()
-    return user
+    principal = Principal.from_user(user)
+    principal_cache.set(key, principal, [("user", user_id)], generation)
+    return principal
    
+# argon2 is slow on purpose: it always runs on the bounded password pool
 def hash_password(plain: str) -> str:
-    return password_hash.hash(plain)
+    return password_pool.run(_hash, plain)
 
 def verify_password(plain: str, hashed: str) -> bool:
-    return password_hash.verify(plain, hashed)
+    return password_pool.run(_verify, plain, hashed)
+
+async def hash_password_async(plain: str) -> str:
+    return await password_pool.run_async(_hash, plain)
+
+async def verify_password_async(plain: str, hashed: str) -> bool:
+    return await password_pool.run_async(_verify, plain, hashed)
 
 
 def require_role(min_role: Literal["admin", "user", "editor"]):
     order = {"user": 0, "editor": 1, "admin": 2}
     
-    def evaluation(user: User = Depends(get_current_user)) -> User:
+    def evaluation(user: Principal = Depends(get_current_user)) -> Principal:
         if order[user.role] < order[min_role]:
             raise raise_forbidden()
         return user
     
     return evaluation
 
-async def auth2_token(form: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    repository = UserRepository(db)
-    user = repository.get_by_email(form.username)
-    if not user or not verify_password(form.password, user.hashed_password):
+async def auth2_token(form: OAuth2PasswordRequestForm = Depends(), db: AsyncDB = Depends(get_async_db)):
+    repository = AsyncUserRepository(db)
+    user = await repository.get_by_email(form.username)
+    await db.close()  # no connection held while argon2 runs
+    if not user or not await verify_password_async(form.password, user.hashed_password):
         raise invalid_credentials()
-    token = create_access_token(sub=str(user.id), minutes=60*24*7)  # 7 days
+    token = create_access_token(sub=str(user.id), minutes=60*24*7, version=user.version)  # 7 days
     return {"access_token": token, "token_type": "bearer"}
     
 
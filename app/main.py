@@ -6,11 +6,14 @@ from dotenv import load_dotenv
 from app.api.v1.post.router import router as post_router
 from app.api.v1.auth.router import router as auth_router
 from app.api.uploads.router import router as uploads_router
+from app.api.metrics.router import router as metrics_router
 from app.api.v1.tags.router import router as tags_router
 from app.api.v1.categories.router import router as categories_router
-from fastapi.staticfiles import StaticFiles
 
 from app.core.middleware import register_middleware
+from app.services.search import ensure_search_index
+from app.services.etag import ensure_version_columns
+from app.services.file_storage import MediaFiles
 
 
 
@@ -33,6 +36,8 @@ def create_app() -> FastAPI:
         swagger_ui_parameters={"persistAuthorization": True},
     )
     Base.metadata.create_all(bind=engine) #dev database
+    ensure_version_columns(engine)
+    ensure_search_index(engine)
     
     register_middleware(app)
     
@@ -41,9 +46,10 @@ def create_app() -> FastAPI:
     app.include_router(uploads_router)
     app.include_router(tags_router)
     app.include_router(categories_router)
+    app.include_router(metrics_router)
     
     os.makedirs(MEDIA_DIR, exist_ok=True)
-    app.mount("/media", StaticFiles(directory=MEDIA_DIR), name="media")
+    app.mount("/media", MediaFiles(directory=MEDIA_DIR), name="media")
     
 
     return app
@@ -2,5 +2,8 @@ from .post import PostORM, post_tags
 from .tag import TagORM
 from .user import User
 from .category import CategoryORM
+from .slug_counter import SlugCounterORM
+from .media import MediaORM
+from .table_version import TableVersionORM
 
-__all__ = ["PostORM", "post_tags", "TagORM", "User", "CategoryORM"]
\ No newline at end of file
+__all__ = ["PostORM", "post_tags", "TagORM", "User", "CategoryORM", "SlugCounterORM", "MediaORM", "TableVersionORM"]
\ No newline at end of file
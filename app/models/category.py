@@ -6,8 +6,12 @@ from sqlalchemy import Integer, String
 
 class CategoryORM(Base):
     __tablename__ = "categories"
+    __table_args__ = {"sqlite_autoincrement": True}
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     name: Mapped[str] = mapped_column(String(100), unique=True, index=True, nullable=False)
     slug:Mapped[str] = mapped_column(String(100), unique=True, index=True, nullable=False)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=1)
     
-    posts = relationship("PostORM", back_populates="category", cascade="all, delete", passive_deletes=True)
\ No newline at end of file
+    posts = relationship("PostORM", back_populates="category", cascade="all, delete", passive_deletes=True, lazy="raise_on_sql")
+
+    __mapper_args__ = {"version_id_col": version}
\ No newline at end of file
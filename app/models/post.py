@@ -1,6 +1,6 @@
 import re
 from typing import List, Optional, TYPE_CHECKING
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, UniqueConstraint, func, null, select, ForeignKey, Table
+from sqlalchemy import Column, Index, Integer, String, Text, DateTime, Boolean, UniqueConstraint, func, null, select, ForeignKey, Table
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.core.db import Base
 
@@ -28,19 +28,26 @@ post_tags = Table(
 
 class PostORM(Base):
     __tablename__ = "post"
-    __table_args__ = (UniqueConstraint("title", "content", name="unique_post_title"),)
+    __table_args__ = (UniqueConstraint("title", "content", name="unique_post_title"), {"sqlite_autoincrement": True})
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     title: Mapped[str] = mapped_column(String(100), nullable=False, index=True)
     slug: Mapped[str] = mapped_column(String(150), unique=True, index=True)
     content: Mapped[str] = mapped_column(Text, nullable=False)
     image_url: Mapped[str | None] = mapped_column(String(300), nullable=True)
     create_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=1)
 
     user_id: Mapped[Optional[int]] = mapped_column(ForeignKey("users.id"))
-    user: Mapped[Optional["User"]] = relationship(back_populates="posts")
+    user: Mapped[Optional["User"]] = relationship(back_populates="posts", lazy="raise_on_sql")
     
     
     category_id: Mapped[Optional[int]] = mapped_column(ForeignKey("categories.id", ondelete="SET NULL"), nullable=True, index=True)
-    category = relationship("CategoryORM", back_populates="posts")
+    category = relationship("CategoryORM", back_populates="posts", lazy="raise_on_sql")
 
-    tags: Mapped[List["TagORM"]] = relationship(secondary=post_tags, back_populates="posts", lazy="selectin",passive_deletes=True)
\ No newline at end of file
+    tags: Mapped[List["TagORM"]] = relationship(secondary=post_tags, back_populates="posts", lazy="raise_on_sql",passive_deletes=True)
+
+    __mapper_args__ = {"version_id_col": version}
+
+
+# keyset pagination by title seeks on (lower(title), id)
+Index("ix_post_lower_title_id", func.lower(PostORM.title), PostORM.id)
\ No newline at end of file
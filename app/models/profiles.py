@@ -0,0 +1,57 @@
+from typing import Dict, Iterable, Tuple
+from sqlalchemy.orm import joinedload, load_only, raiseload, selectinload
+from sqlalchemy.orm.interfaces import LoaderOption
+
+from .category import CategoryORM
+from .post import PostORM
+from .tag import TagORM
+from .user import User
+
+
+# Relationships default to lazy="raise_on_sql": nothing is pulled in unless the
+# repository asks for it with one of these profiles, one per response shape.
+LOADER_PROFILES: Dict[str, Tuple[LoaderOption, ...]] = {
+    # PostPublic: tags (collection -> one selectin query per page), author and category
+    # (to-one -> joined into the page query), only the columns the schemas render
+    "post_full": (
+        selectinload(PostORM.tags).load_only(TagORM.name),
+        joinedload(PostORM.user).load_only(User.email, User.full_name, User.role, User.is_active),
+        joinedload(PostORM.category).load_only(CategoryORM.name, CategoryORM.slug),
+        raiseload("*"),
+    ),
+    # PostSummary: id and title, the content column is never selected
+    "post_summary": (load_only(PostORM.id, PostORM.title, PostORM.user_id, PostORM.category_id), raiseload("*")),
+    # write paths: post columns only
+    "post_write": (raiseload("*"),),
+    # TagPublic: tag columns only, never the posts behind a tag
+    "tag_only": (raiseload("*"),),
+}
+
+
+# sparse fieldsets (?fields=): what each PostPublic field needs loaded, the foreign keys
+# are always read since cache invalidation depends on them
+POST_FIELD_COLUMNS = {
+    "title": (PostORM.title,),
+    "content": (PostORM.content,),
+    "image_url": (PostORM.image_url,),
+    "slug": (PostORM.slug,),
+}
+POST_FIELD_RELATIONSHIPS = {
+    "tags": LOADER_PROFILES["post_full"][0],
+    "user": LOADER_PROFILES["post_full"][1],
+    "category": LOADER_PROFILES["post_full"][2],
+}
+
+
+def with_profile(query, profile: str):
+    return query.options(*LOADER_PROFILES[profile])
+
+
+def with_fields(query, fields: Iterable[str]):
+    columns = [PostORM.id, PostORM.user_id, PostORM.category_id]
+    relationships = []
+    for field in fields:
+        columns += POST_FIELD_COLUMNS.get(field, ())
+        if field in POST_FIELD_RELATIONSHIPS:
+            relationships.append(POST_FIELD_RELATIONSHIPS[field])
+    return query.options(load_only(*columns), *relationships, raiseload("*"))
\ No newline at end of file
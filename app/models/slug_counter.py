@@ -0,0 +1,10 @@
+from app.core.db import Base
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import Integer, String
+
+
+
+class SlugCounterORM(Base):
+    __tablename__ = "slug_counters"
+    base: Mapped[str] = mapped_column(String(150), primary_key=True)
+    last: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
\ No newline at end of file
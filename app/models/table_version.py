@@ -0,0 +1,11 @@
+from app.core.db import Base
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import Integer, String
+
+
+
+class TableVersionORM(Base):
+    """Change counter per table, bumped at the commit of every write (see app/services/etag.py)."""
+    __tablename__ = "table_versions"
+    name: Mapped[str] = mapped_column(String(100), primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
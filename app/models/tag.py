@@ -11,8 +11,12 @@ if TYPE_CHECKING:
 
 class TagORM(Base):
     __tablename__ = "tags"
+    __table_args__ = {"sqlite_autoincrement": True}
     
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     name: Mapped[str] = mapped_column(String(50), unique=True, index=True)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=1)
     
-    posts: Mapped[List["PostORM"]] = relationship(secondary="post_tags", back_populates="tags", lazy="selectin")
\ No newline at end of file
+    posts: Mapped[List["PostORM"]] = relationship(secondary="post_tags", back_populates="tags", lazy="raise_on_sql", passive_deletes=True)
+
+    __mapper_args__ = {"version_id_col": version}
\ No newline at end of file
@@ -2,7 +2,7 @@
 from typing import Literal, List
 from app.core.db import Base
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, Enum, Boolean, DateTime
+from sqlalchemy import Integer, String, Enum, Boolean, DateTime
 from datetime import datetime
 from .post import PostORM
 
@@ -11,6 +11,7 @@ Role = Literal["admin", "user", "editor"]
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = {"sqlite_autoincrement": True}
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     email: Mapped[str] = mapped_column(String(255), unique=True, index=True, nullable=False)
     hashed_password: Mapped[str] = mapped_column(String(255), nullable=False)
@@ -18,9 +19,12 @@ class User(Base):
     role: Mapped[Role] = mapped_column(Enum("admin", "user", "editor", name="role_enum"), default="user")
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
     created_at: Mapped[str] = mapped_column(DateTime, default=datetime.utcnow)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=1)
     
     
-    posts: Mapped[List["PostORM"]] = relationship(back_populates="user")
+    posts: Mapped[List["PostORM"]] = relationship(back_populates="user", lazy="raise_on_sql")
+    
+    __mapper_args__ = {"version_id_col": version}
     
    
     
@@ -0,0 +1,98 @@
+import csv
+import json
+from typing import AsyncIterator, List, Optional, Tuple
+from fastapi import HTTPException, status
+from pydantic import ValidationError
+
+
+MAX_LINE_BYTES = 1024 * 1024
+MAX_REPORTED_ERRORS = 1000
+
+# (line number, parsed record or None, error or None)
+Record = Tuple[int, Optional[dict], Optional[str]]
+
+
+async def iter_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, bytes]]:
+    # only the current partial line is buffered, never the whole body
+    buffer = b""
+    line_no = 0
+    async for chunk in stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_no += 1
+            yield line_no, line
+        if len(buffer) > MAX_LINE_BYTES:
+            raise HTTPException(status_code=status.HTTP_413_CONTENT_TOO_LARGE, detail=f"Line {line_no + 1} is longer than {MAX_LINE_BYTES} bytes")
+    if buffer:
+        yield line_no + 1, buffer
+
+
+def _decode(raw: bytes) -> Optional[str]:
+    try:
+        return raw.decode("utf-8").removeprefix("\ufeff").rstrip("\r")
+    except UnicodeDecodeError:
+        return None
+
+
+def _tags(value) -> List[str]:
+    if isinstance(value, list):
+        return [str(name) for name in value]
+    return [name for name in str(value or "").split(",") if name.strip()]
+
+
+async def ndjson_records(stream: AsyncIterator[bytes]) -> AsyncIterator[Record]:
+    async for line_no, raw in iter_lines(stream):
+        line = _decode(raw)
+        if line is None:
+            yield line_no, None, "line is not valid UTF-8"
+            continue
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError:
+            yield line_no, None, "line is not valid JSON"
+            continue
+        if not isinstance(data, dict):
+            yield line_no, None, "line is not a JSON object"
+            continue
+        yield line_no, {**data, "tags": _tags(data.get("tags"))}, None
+
+
+async def csv_records(stream: AsyncIterator[bytes]) -> AsyncIterator[Record]:
+    header: Optional[List[str]] = None
+    pending, start = "", 0
+    async for line_no, raw in iter_lines(stream):
+        line = _decode(raw)
+        if line is None:
+            yield line_no, None, "line is not valid UTF-8"
+            continue
+        if not pending and not line.strip():
+            continue
+
+        # a quoted field may span lines: the record is complete once its quotes are balanced
+        pending, start = (f"{pending}\n{line}", start) if pending else (line, line_no)
+        if pending.count('"') % 2:
+            continue
+        values, pending = next(csv.reader([pending])), ""
+
+        if header is None:
+            header = [name.strip().lower() for name in values]
+            continue
+        if len(values) != len(header):
+            yield start, None, f"expected {len(header)} columns, got {len(values)}"
+            continue
+        data = {key: value for key, value in zip(header, values) if value != ""}
+        yield start, {**data, "tags": _tags(data.get("tags"))}, None
+
+    if pending:
+        yield start, None, "unterminated quoted field"
+
+
+def parse_records(stream: AsyncIterator[bytes], fmt: str) -> AsyncIterator[Record]:
+    return csv_records(stream) if fmt == "csv" else ndjson_records(stream)
+
+
+def validation_messages(exc: ValidationError) -> List[str]:
+    return [f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in exc.errors()]
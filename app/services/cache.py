@@ -0,0 +1,98 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Set, Tuple
+
+from app.core.config import settings
+
+
+class ResponseCache:
+    """In-process LRU + TTL cache of serialized responses.
+
+    Every entry is stored with the rows it was built from (e.g. ("post", 1), ("tag", 3)),
+    so a write only drops the entries that depend on the rows it touched.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any, Set[Hashable]]]" = OrderedDict()
+        self._dependents: Dict[Hashable, Set[Hashable]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, deps: Iterable[Hashable], generation: int) -> None:
+        """Store `value` unless something was invalidated after `generation` was read (it may be stale)."""
+        if self.maxsize <= 0:
+            return
+
+        with self._lock:
+            if generation != self.generation:
+                return
+            if key in self._entries:
+                self._drop(key)
+
+            deps = set(deps)
+            self._entries[key] = (time.monotonic() + self.ttl, value, deps)
+            for dep in deps:
+                self._dependents.setdefault(dep, set()).add(key)
+
+            while len(self._entries) > self.maxsize:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, *deps: Hashable) -> None:
+        with self._lock:
+            self.generation += 1
+            for dep in deps:
+                for key in list(self._dependents.get(dep, ())):
+                    self._drop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._dependents.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def _drop(self, key: Hashable) -> None:
+        _, _, deps = self._entries.pop(key)
+        for dep in deps:
+            keys = self._dependents.get(dep)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._dependents[dep]
+
+
+post_cache = ResponseCache(maxsize=settings.POST_CACHE_SIZE, ttl=settings.POST_CACHE_TTL)
+# authenticated principals by (user_id, token version), see get_current_user
+principal_cache = ResponseCache(maxsize=settings.PRINCIPAL_CACHE_SIZE, ttl=settings.PRINCIPAL_CACHE_TTL)
@@ -0,0 +1,96 @@
+import hashlib
+from typing import Any, Optional
+from fastapi import Request, Response, status
+from sqlalchemy import event, inspect, select, text, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models import CategoryORM, PostORM, TagORM
+from app.models.table_version import TableVersionORM
+from app.models.user import User
+
+
+def make_etag(*parts: Any) -> str:
+    return '"' + hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest() + '"'
+
+
+# version_id_col tables: their version goes into the ETag of a single row
+VERSIONED = (PostORM, TagORM, CategoryORM, User)
+
+
+def ensure_version_columns(engine: Engine) -> None:
+    """Add the version column to tables created before it existed, create_all never alters a table."""
+    inspector = inspect(engine)
+    quote = engine.dialect.identifier_preparer.quote
+    with engine.begin() as conn:
+        for model in VERSIONED:
+            table = model.__tablename__
+            if not inspector.has_table(table):
+                continue
+            if "version" not in {column["name"] for column in inspector.get_columns(table)}:
+                conn.execute(text(f"ALTER TABLE {quote(table)} ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+
+
+def bump_table_versions(session: Session, tables) -> None:
+    """+1 on the change counter of every table: list ETags read these counters (one primary
+    key lookup) instead of aggregating the tables themselves."""
+    versions = TableVersionORM.__table__
+    connection = session.connection()
+    dialect = connection.dialect.name
+
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        query = insert(versions).values([{"name": name, "version": 1} for name in tables])
+        connection.execute(query.on_conflict_do_update(
+            index_elements=[versions.c.name],
+            set_={"version": versions.c.version + 1},
+        ))
+        return
+
+    for name in tables:
+        bumped = connection.execute(update(versions).where(versions.c.name == name).values(version=versions.c.version + 1))
+        if not bumped.rowcount:
+            connection.execute(versions.insert().values(name=name, version=1))
+
+
+@event.listens_for(Session, "before_commit")
+def _bump_written_tables(session: Session) -> None:
+    # once per transaction, right before COMMIT and always in name order: the counter rows stay
+    # locked only for the commit itself and two writers can never take them in opposite orders
+    if session.in_nested_transaction():
+        return
+    session.flush()  # before_commit runs ahead of the final flush, its tables count too
+    written = session.info.get("written_tables")  # recorded by the flush hook and mark_written (pagination)
+    if written:
+        bump_table_versions(session, sorted(written))
+
+
+def table_versions(db: Session, *tables: str) -> tuple:
+    # change counters bumped by every committed write (_bump_written_tables):
+    # one primary key lookup, whatever the size of the tables behind them
+    rows = dict(db.execute(select(TableVersionORM.name, TableVersionORM.version).where(TableVersionORM.name.in_(tables))).all())
+    return tuple(rows.get(name, 0) for name in tables)
+
+
+def not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison, W/"x" matches "x"
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return etag in tags
+
+
+def not_modified_response(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+
+def conditional(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """304 response when the client already holds `etag`, otherwise tag the outgoing response with it."""
+    if not_modified(request, etag):
+        return not_modified_response(etag)
+    response.headers["ETag"] = etag
+    return None
@@ -1,7 +1,11 @@
+import hashlib
 import os
-import shutil
+import re
 import uuid
+from typing import AsyncIterator, Awaitable, Callable, Optional, Tuple
 from fastapi import  File, HTTPException, UploadFile, status
+from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
 
 
 
@@ -10,6 +14,20 @@ ALLOW_MIME = ["image/jpeg", "image/png"]
 MAX_MB = int(os.getenv("MAX_UPLOAD_MB", "10"))
 CHUNKS = 1024*1024
 
+# the type comes from the first bytes of the file, never from the client's content_type or filename
+MAGIC = (
+    (b"\xff\xd8\xff", "image/jpeg", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png", ".png"),
+)
+SNIFF_BYTES = 8
+
+# blobs live at ab/cd/<sha256>.ext: the name is the content, so a URL never changes meaning
+CONTENT_PATH = re.compile(r"^[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.[a-z]+$")
+
+
+def content_path(digest: str, ext: str) -> str:
+    return f"{digest[:2]}/{digest[2:4]}/{digest}{ext}"
+
 def ensure_media_dir() -> None:
     os.makedirs(MEDIA_DIR, exist_ok=True)
 
@@ -29,48 +47,152 @@ async def upload_file(file: UploadFile = File(...)) -> dict:
     
     
 
-def save_uploaded_file(file: UploadFile) -> dict:
-        
-    if file.content_type not in ALLOW_MIME:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid file type just jpeg or png")
-    
-    ensure_media_dir()
-    ext = os.path.splitext(file.filename)[1] 
-    filename = f"{uuid.uuid4().hex}{ext}"
-    file_path = os.path.join(MEDIA_DIR, filename)
-    
-    # class _ChunkCounter:
-    #     def __init__(self, f):
-    #         self._f = f
-    #         self.calls = 0
-    #         self.sizes = []
-    #     def read(self, n=-1):
-    #         data = self._f.read(n)
-    #         if data:
-    #             self.calls += 1
-    #             self.sizes.append(len(data))
-    #         return data
-    #     def __getattr__(self, name):  # delega cualquier otro atributo
-    #         return getattr(self._f, name)
-
-    # reader = _ChunkCounter(file.file)
-    
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer, CHUNKS)
-        
-    size = os.path.getsize(file_path)
-    if size > MAX_MB * CHUNKS:
-        os.remove(file_path)
-        raise HTTPException(status_code=status.HTTP_413_CONTENT_TOO_LARGE, detail=f"File too large. Max size is {MAX_MB} MB")
-        
-    
-        
-    return {
-        "filename": filename,
-        "content_type": file.content_type,
-        "url": f"/media/{filename}",
-        # "size": size,
-        # "chunks_size_used": CHUNKS,
-        # "chunk_calls": reader.calls,
-        # "chunk_sizes_sample": reader.sizes[:5]
-    }
\ No newline at end of file
+def sniff_image(head: bytes) -> Optional[Tuple[str, str]]:
+    for magic, mime, ext in MAGIC:
+        if head.startswith(magic) and mime in ALLOW_MIME:
+            return mime, ext
+    return None
+
+
+class UploadWriter:
+    """Writes an upload chunk by chunk into a hidden temp file of MEDIA_DIR, hashing as it goes.
+
+    The size is checked as bytes arrive, so an oversized upload stops at the limit instead of
+    landing on disk first. Once complete the file is renamed (atomically) to its content path;
+    if those bytes are already stored the temp file is dropped and the existing blob reused.
+    """
+
+    def __init__(self, max_bytes: int = MAX_MB * CHUNKS):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.content_type: Optional[str] = None
+        self.ext: Optional[str] = None
+        self._head = b""
+        self._file = None
+        self._tmp_path: Optional[str] = None
+        self._hash = hashlib.sha256()
+
+    def count(self, n: int) -> None:
+        self.size += n
+        if self.size > self.max_bytes:
+            raise HTTPException(status_code=status.HTTP_413_CONTENT_TOO_LARGE, detail=f"File too large. Max size is {MAX_MB} MB")
+
+    def write(self, chunk: bytes) -> None:
+        if self._file is None:
+            # nothing touches the disk until the first bytes say it is an image
+            self._head += chunk
+            if len(self._head) < SNIFF_BYTES:
+                return
+            self._open()
+            chunk, self._head = self._head, b""
+        self._hash.update(chunk)
+        self._file.write(chunk)
+
+    def _open(self) -> None:
+        kind = sniff_image(self._head)
+        if kind is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid file type just jpeg or png")
+        self.content_type, self.ext = kind
+        ensure_media_dir()
+        self._tmp_path = os.path.join(MEDIA_DIR, f".{uuid.uuid4().hex}.part")
+        self._file = open(self._tmp_path, "wb")
+
+    def finish(self) -> dict:
+        """Close the temp file: the blob is known (hash, url) but not in place yet."""
+        if self._file is None:
+            self._open()  # shorter than SNIFF_BYTES, almost certainly rejected here
+            self._hash.update(self._head)
+            self._file.write(self._head)
+        self._file.close()
+        self._file = None
+
+        digest = self._hash.hexdigest()
+        relative = content_path(digest, self.ext)
+        return {
+            "filename": os.path.basename(relative),
+            "content_type": self.content_type,
+            "url": f"/media/{relative}",
+            "size": self.size,
+            "sha256": digest,
+        }
+
+    def place(self, saved: dict) -> dict:
+        final_path = os.path.join(MEDIA_DIR, saved["url"].removeprefix("/media/"))
+        saved["duplicate"] = os.path.exists(final_path)
+        if saved["duplicate"]:
+            os.remove(self._tmp_path)
+        else:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(self._tmp_path, final_path)
+        self._tmp_path = None
+        return saved
+
+    def abort(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._tmp_path is None:
+            return
+        try:
+            os.remove(self._tmp_path)
+        except FileNotFoundError:
+            pass
+
+
+# `register` records the blob (register_media) between hashing and moving the file into place:
+# once its row is fresh the GC leaves these bytes alone, so a file found there can be reused
+def save_uploaded_file(file: UploadFile, register: Callable[[dict], None]) -> dict:
+    # sync routes (create_post) already run in the threadpool, so plain blocking I/O is fine here
+    writer = UploadWriter()
+    try:
+        while chunk := file.file.read(CHUNKS):
+            writer.count(len(chunk))
+            writer.write(chunk)
+        saved = writer.finish()
+        register(saved)
+        return writer.place(saved)
+    except BaseException:
+        writer.abort()
+        raise
+
+
+async def save_upload_stream(chunks: AsyncIterator[bytes], register: Callable[[dict], Awaitable[None]]) -> dict:
+    """Stream chunks to MEDIA_DIR from async code: counted on the loop, written in the threadpool."""
+    writer = UploadWriter()
+    pending, pending_size = [], 0
+    try:
+        async for chunk in chunks:
+            writer.count(len(chunk))
+            pending.append(chunk)
+            pending_size += len(chunk)
+            # one threadpool hop per CHUNKS, not per network read
+            if pending_size >= CHUNKS:
+                await run_in_threadpool(writer.write, b"".join(pending))
+                pending, pending_size = [], 0
+        if pending:
+            await run_in_threadpool(writer.write, b"".join(pending))
+        saved = await run_in_threadpool(writer.finish)
+        await register(saved)
+        return await run_in_threadpool(writer.place, saved)
+    except BaseException:
+        writer.abort()
+        raise
+
+
+async def save_upload(file: UploadFile, register: Callable[[dict], Awaitable[None]]) -> dict:
+    async def chunks() -> AsyncIterator[bytes]:
+        while chunk := await file.read(CHUNKS):
+            yield chunk
+
+    return await save_upload_stream(chunks(), register)
+
+
+class MediaFiles(StaticFiles):
+    """The /media mount: content-addressed blobs never change, browsers and CDNs may keep them forever."""
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        relative = os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+        if CONTENT_PATH.match(relative):
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
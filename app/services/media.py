@@ -0,0 +1,160 @@
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Iterable, List
+from sqlalchemy import delete, event, inspect, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, object_session
+
+from app.core.config import settings
+from app.models.media import MediaORM
+from app.models.post import PostORM
+from app.services.file_storage import CONTENT_PATH, MEDIA_DIR
+
+
+# Reference counting: PostORM events move media.ref_count in the same transaction as the post,
+# a blob that dropped to 0 is reaped (row and file) once the commit went through.
+# Uploads not yet attached to a post also sit at 0, last_seen keeps them for MEDIA_GC_GRACE_SECONDS.
+# An upload registers its row before its file goes in place and the reaper unlinks before its
+# DELETE commits, so the two never interleave on one blob: the locked row makes the other wait.
+
+
+def register_media(db: Session, saved: dict) -> None:
+    """Record (or refresh) the blob behind an upload, before any post points at it."""
+    now = datetime.utcnow()
+    values = {
+        "sha256": saved["sha256"],
+        "url": saved["url"],
+        "content_type": saved["content_type"],
+        "size": saved["size"],
+        "ref_count": 0,
+        "last_seen": now,
+    }
+    dialect = db.get_bind().dialect.name
+
+    # an upsert: the same bytes uploaded twice at once must not fail on the primary key
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        query = insert(MediaORM).values(values)
+        db.execute(query.on_conflict_do_update(index_elements=[MediaORM.sha256], set_={"last_seen": now}))
+        return
+
+    media = db.get(MediaORM, saved["sha256"])
+    if media is None:
+        db.add(MediaORM(**values))
+    else:
+        media.last_seen = now
+
+
+def _grace_cutoff() -> datetime:
+    return datetime.utcnow() - timedelta(seconds=settings.MEDIA_GC_GRACE_SECONDS)
+
+
+def _adjust(connection, session: Session, url, delta: int) -> None:
+    if not url:
+        return
+    connection.execute(update(MediaORM).where(MediaORM.url == url).values(ref_count=MediaORM.ref_count + delta))
+    if delta < 0 and session is not None:
+        session.info.setdefault("released_media", set()).add(url)
+
+
+def claim_media(db: Session, url: str) -> bool:
+    """Point at an existing blob: refreshes last_seen, so the GC keeps it until the post commits."""
+    return db.execute(update(MediaORM).where(MediaORM.url == url).values(last_seen=datetime.utcnow())).rowcount > 0
+
+
+@event.listens_for(PostORM, "after_insert")
+def _post_inserted(mapper, connection, target: PostORM) -> None:
+    _adjust(connection, object_session(target), target.image_url, +1)
+
+
+@event.listens_for(PostORM, "after_update")
+def _post_updated(mapper, connection, target: PostORM) -> None:
+    history = inspect(target).attrs.image_url.history
+    if not history.has_changes():
+        return
+    session = object_session(target)
+    for url in history.added:
+        _adjust(connection, session, url, +1)
+    for url in history.deleted:
+        _adjust(connection, session, url, -1)
+
+
+@event.listens_for(PostORM, "after_delete")
+def _post_deleted(mapper, connection, target: PostORM) -> None:
+    _adjust(connection, object_session(target), target.image_url, -1)
+
+
+def _unlink(urls: Iterable[str]) -> None:
+    for url in urls:
+        try:
+            os.remove(os.path.join(MEDIA_DIR, url.removeprefix("/media/")))
+        except FileNotFoundError:
+            pass
+
+
+def _reap(db: Session, urls: Iterable[str]) -> List[str]:
+    # one transaction per blob, the file goes while the deleted row is still locked: an upload
+    # of the same bytes waits in register_media and only then moves its own file into place
+    reaped = []
+    for url in urls:
+        gone = db.execute(
+            delete(MediaORM)
+            .where(MediaORM.url == url, MediaORM.ref_count <= 0, MediaORM.last_seen < _grace_cutoff())
+            .returning(MediaORM.url)
+        ).scalar()
+        if gone:
+            _unlink([gone])
+            reaped.append(gone)
+        db.commit()
+    return reaped
+
+
+@event.listens_for(Session, "after_commit")
+def _reap_released_media(session: Session) -> None:
+    if session.in_nested_transaction():
+        return  # a released savepoint, the post is not committed yet
+    released = session.info.pop("released_media", None)
+    if not released:
+        return
+    # the committed session cannot run SQL any more, the reaping gets its own
+    try:
+        with Session(bind=session.get_bind()) as reaper:
+            _reap(reaper, released)
+    except SQLAlchemyError:
+        pass  # the post is committed either way, collect_garbage picks these up later
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_released_media(session: Session) -> None:
+    if session.in_nested_transaction():
+        return  # reaping re-checks ref_count, a url kept from a rolled back savepoint is harmless
+    session.info.pop("released_media", None)
+
+
+def _untracked_files(db: Session) -> List[str]:
+    # blobs whose row was rolled back (a failed create_post) and temp files of crashed uploads
+    known = set(db.execute(select(MediaORM.url)).scalars())
+    cutoff = time.time() - settings.MEDIA_GC_GRACE_SECONDS
+    found = []
+    for root, _, files in os.walk(MEDIA_DIR):
+        for name in files:
+            path = os.path.join(root, name)
+            url = "/media/" + os.path.relpath(path, MEDIA_DIR).replace(os.sep, "/")
+            stray = (CONTENT_PATH.match(url.removeprefix("/media/")) and url not in known) or name.endswith(".part")
+            if stray and os.path.getmtime(path) < cutoff:
+                found.append(url)
+    return found
+
+
+def collect_garbage(db: Session) -> List[str]:
+    """Sweep blobs no post uses and nobody uploaded within the grace period (abandoned uploads)."""
+    candidates = db.execute(
+        select(MediaORM.url).where(MediaORM.ref_count <= 0, MediaORM.last_seen < _grace_cutoff())
+    ).scalars().all()
+    db.commit()
+    doomed = _reap(db, candidates)
+    stray = _untracked_files(db)
+    _unlink(stray)
+    return doomed + stray
@@ -0,0 +1,232 @@
+import bisect
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import anyio
+import anyio.to_thread
+
+from app.core.config import settings
+
+
+Labels = Tuple[str, ...]
+
+# name: (type, help, label names)
+METRICS = {
+    "http_requests_total": ("counter", "HTTP requests by route template, method and status class.", ("method", "route", "status")),
+    "http_request_duration_seconds": ("histogram", "HTTP request latency by route template and method.", ("method", "route")),
+    "http_requests_in_flight": ("gauge", "HTTP requests being served right now.", ()),
+    "db_pool_capacity": ("gauge", "Connections the pool may open (pool_size + max_overflow).", ("engine",)),
+    "db_pool_checked_out": ("gauge", "Connections currently checked out of the pool.", ("engine",)),
+    "db_pool_checked_in": ("gauge", "Idle connections currently in the pool.", ("engine",)),
+    "threadpool_borrowed_tokens": ("gauge", "Threadpool workers busy with sync routes and run_in_threadpool calls.", ()),
+    "threadpool_total_tokens": ("gauge", "Threadpool size.", ()),
+    "threadpool_tasks_waiting": ("gauge", "Calls waiting for a free threadpool worker.", ()),
+}
+
+METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values))
+    return f"{{{pairs}}}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Metrics:
+    """Request metrics of this process, rendered in the Prometheus text format.
+
+    Only the event loop thread records (the middleware), so counters are plain dicts with
+    no lock on the request path; readers take C-level copies. With METRICS_MULTIPROC_DIR set,
+    every worker also dumps its snapshot there (metrics-<pid>.json, atomic rename) once per
+    METRICS_FLUSH_SECONDS and /metrics, served by any worker, adds all of them up: counters and
+    histograms of dead workers are kept, their gauges dropped. Clear the directory on deploy.
+    """
+
+    def __init__(self, buckets: Iterable[float], multiproc_dir: Optional[str] = None, flush_seconds: float = 1.0):
+        self.buckets = tuple(sorted(buckets))
+        self.multiproc_dir = multiproc_dir
+        self.flush_seconds = flush_seconds
+        # scrapes get a thread of their own: they must not queue behind busy sync routes
+        self._scrape_limiter = anyio.CapacityLimiter(1)
+        self._reset()
+        if multiproc_dir:
+            os.makedirs(multiproc_dir, exist_ok=True)
+        # a forked worker starts from zero and runs its own flusher
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self) -> None:
+        self.counters: Dict[Labels, int] = {}
+        # per (method, route): a count per bucket (the last one is +Inf) and the sum at the end
+        self.histograms: Dict[Labels, List[float]] = {}
+        self.in_flight = 0
+        self.threadpool = (0, 0, 0)
+        self._flusher: Optional[threading.Thread] = None
+
+    # --- recording, event loop only ---
+
+    def request_started(self) -> None:
+        self.in_flight += 1
+        if self.multiproc_dir and self._flusher is None:
+            self._flusher = threading.Thread(target=self._flush_forever, name="metrics-flush", daemon=True)
+            self._flusher.start()
+
+    def request_finished(self, method: str, route: Optional[str], status: int, duration: float) -> None:
+        self.in_flight -= 1
+        # bounded label values: unknown methods and unmatched paths share one series
+        method = method if method in METHODS else "other"
+        route = route or "unmatched"
+
+        key = (method, route, f"{status // 100}xx")
+        self.counters[key] = self.counters.get(key, 0) + 1
+
+        histogram = self.histograms.get((method, route))
+        if histogram is None:
+            histogram = self.histograms[(method, route)] = [0] * (len(self.buckets) + 1) + [0.0]
+        histogram[bisect.bisect_left(self.buckets, duration)] += 1
+        histogram[-1] += duration
+
+    def sample_threadpool(self) -> None:
+        limiter = anyio.to_thread.current_default_thread_limiter()
+        self.threadpool = (limiter.borrowed_tokens, limiter.total_tokens, limiter.statistics().tasks_waiting)
+
+    # --- reading ---
+
+    def _pool_gauges(self) -> Dict[str, list]:
+        from app.core import db
+
+        engines = [("primary", db.engine)] + [(f"replica-{i}", e) for i, e in enumerate(db.read_engines)]
+        if db.async_engine is not None:
+            engines.append(("async-primary", db.async_engine.sync_engine))
+            engines += [(f"async-replica-{i}", f.kw["bind"].sync_engine) for i, f in enumerate(db.AsyncReadSessionLocals)]
+
+        gauges: Dict[str, list] = {"db_pool_capacity": [], "db_pool_checked_out": [], "db_pool_checked_in": []}
+        for name, db_engine in engines:
+            pool = db_engine.pool
+            if not hasattr(pool, "checkedout"):
+                continue  # StaticPool and friends (in-memory SQLite) have nothing to report
+            gauges["db_pool_capacity"].append([[name], pool.size() + max(getattr(pool, "_max_overflow", 0), 0)])
+            gauges["db_pool_checked_out"].append([[name], pool.checkedout()])
+            gauges["db_pool_checked_in"].append([[name], pool.checkedin()])
+        return gauges
+
+    def snapshot(self) -> dict:
+        borrowed, total, waiting = self.threadpool
+        return {
+            "pid": os.getpid(),
+            "buckets": list(self.buckets),
+            "counters": {"http_requests_total": [[list(k), v] for k, v in list(self.counters.items())]},
+            "histograms": {"http_request_duration_seconds": [[list(k), list(v)] for k, v in list(self.histograms.items())]},
+            "gauges": {
+                "http_requests_in_flight": [[[], self.in_flight]],
+                "threadpool_borrowed_tokens": [[[], borrowed]],
+                "threadpool_total_tokens": [[[], total]],
+                "threadpool_tasks_waiting": [[[], waiting]],
+                **self._pool_gauges(),
+            },
+        }
+
+    def _write(self, snapshot: dict) -> None:
+        path = os.path.join(self.multiproc_dir, f"metrics-{snapshot['pid']}.json")
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp, path)
+
+    def _flush_forever(self) -> None:
+        while True:
+            time.sleep(self.flush_seconds)
+            try:
+                self._write(self.snapshot())
+            except (OSError, RuntimeError):
+                pass  # the next round will try again
+
+    def collect(self) -> List[dict]:
+        own = self.snapshot()
+        if not self.multiproc_dir:
+            return [own]
+
+        self._write(own)
+        snapshots = []
+        for filename in os.listdir(self.multiproc_dir):
+            if not (filename.startswith("metrics-") and filename.endswith(".json")):
+                continue
+            try:
+                with open(os.path.join(self.multiproc_dir, filename)) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if snapshot.get("buckets") != list(self.buckets):
+                continue  # written with another bucket layout, cannot be added up
+            if snapshot["pid"] != own["pid"] and not _alive(snapshot["pid"]):
+                snapshot["gauges"] = {}
+            snapshots.append(snapshot)
+        return snapshots
+
+    def render(self) -> str:
+        counters: Dict[str, Dict[Labels, float]] = {}
+        histograms: Dict[str, Dict[Labels, List[float]]] = {}
+        gauges: Dict[str, Dict[Labels, float]] = {}
+        for snapshot in self.collect():
+            for kind, target in (("counters", counters), ("gauges", gauges)):
+                for name, series in snapshot[kind].items():
+                    merged = target.setdefault(name, {})
+                    for labels, value in series:
+                        merged[tuple(labels)] = merged.get(tuple(labels), 0) + value
+            for name, series in snapshot["histograms"].items():
+                merged = histograms.setdefault(name, {})
+                for labels, values in series:
+                    current = merged.get(tuple(labels))
+                    merged[tuple(labels)] = values if current is None else [a + b for a, b in zip(current, values)]
+
+        lines = []
+        for name, (kind, help_text, label_names) in METRICS.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "histogram":
+                for labels, values in sorted(histograms.get(name, {}).items()):
+                    cumulative = 0
+                    for bound, count in zip(self.buckets + (float("inf"),), values[:-1]):
+                        cumulative += count
+                        le = _labels(label_names + ("le",), labels + (_number(bound),))
+                        lines.append(f"{name}_bucket{le} {_number(cumulative)}")
+                    lines.append(f"{name}_sum{_labels(label_names, labels)} {_number(values[-1])}")
+                    lines.append(f"{name}_count{_labels(label_names, labels)} {_number(cumulative)}")
+            else:
+                for labels, value in sorted((counters if kind == "counter" else gauges).get(name, {}).items()):
+                    lines.append(f"{name}{_labels(label_names, labels)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+    async def render_async(self) -> str:
+        """render() for async code: with a multiproc dir it writes and reads files, so it leaves the event loop."""
+        if not self.multiproc_dir:
+            return self.render()
+        return await anyio.to_thread.run_sync(self.render, limiter=self._scrape_limiter)
+
+
+metrics = Metrics(
+    buckets=[float(b) for b in settings.METRICS_BUCKETS.split(",") if b.strip()],
+    multiproc_dir=settings.METRICS_MULTIPROC_DIR,
+    flush_seconds=settings.METRICS_FLUSH_SECONDS,
+)
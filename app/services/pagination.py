@@ -1,19 +1,183 @@
+import base64
+import binascii
+import json
 from math import ceil
-from typing import Any, Dict, Optional
-from sqlalchemy import func, select
+from typing import Any, Dict, List, Literal, Optional, Sequence, Tuple
+from fastapi import HTTPException, status
+from sqlalchemy import event, func, literal, select, text, tuple_
 from sqlalchemy.orm import Session
+from sqlalchemy.sql.util import find_tables
+from sqlalchemy.types import NullType
+
+from app.core.config import settings
+from app.services.cache import ResponseCache
 
 
 
 DEFAULT_PAGE = 10
 MAX_PER_PAGE = 100
 
+# exact: COUNT(*) over the filtered query
+# cached: exact count reused for COUNT_CACHE_TTL seconds, dropped when a commit writes one of its tables
+# estimated: planner row estimate on Postgres (cached count elsewhere)
+# skip: no count at all, has_next comes from fetching per_page + 1 rows
+CountMode = Literal["exact", "cached", "estimated", "skip"]
+
+count_cache = ResponseCache(maxsize=settings.COUNT_CACHE_SIZE, ttl=settings.COUNT_CACHE_TTL)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_written_tables(session: Session, flush_context) -> None:
+    written = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        mapper = getattr(obj, "__mapper__", None)
+        if mapper is None:
+            continue
+        written.update(table.name for table in mapper.tables)
+        written.update(rel.secondary.name for rel in mapper.relationships if rel.secondary is not None)
+    session.info.setdefault("written_tables", set()).update(written)
+
+
+def mark_written(session: Session, *tables: str) -> None:
+    # Core inserts/updates bypass the flush hook, callers name the tables they wrote
+    session.info.setdefault("written_tables", set()).update(tables)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_counts(session: Session) -> None:
+    if session.in_nested_transaction():
+        return  # a released savepoint: the tables are written once the outer transaction commits
+    written = session.info.pop("written_tables", None)
+    if written:
+        count_cache.invalidate(*(("table", name) for name in written))
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_written_tables(session: Session) -> None:
+    if session.in_nested_transaction():
+        return  # the outer transaction's own writes still count, extra tables only cost a recount
+    session.info.pop("written_tables", None)
+
+
+def _exact_count(db: Session, query) -> int:
+    # counting the query as a subquery stays right for any shape (GROUP BY, DISTINCT, LIMIT)
+    return db.scalar(select(func.count()).select_from(query.order_by(None).subquery())) or 0
+
+
+def _cached_count(db: Session, query) -> int:
+    compiled = query.compile(dialect=db.get_bind().dialect)
+    key = (str(compiled), repr(sorted(compiled.params.items())))
+
+    total = count_cache.get(key)
+    if total is None:
+        generation = count_cache.generation
+        total = _exact_count(db, query)
+        deps = {("table", table.name) for table in find_tables(query, include_joins=True) if hasattr(table, "name")}
+        count_cache.set(key, total, deps, generation)
+    return total
+
+
+def _estimated_count(db: Session, query) -> int:
+    if db.get_bind().dialect.name != "postgresql":
+        return _cached_count(db, query)
+
+    sql = query.order_by(None).compile(dialect=db.get_bind().dialect, compile_kwargs={"literal_binds": True})
+    plan = db.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def count_query(db: Session, query, mode: CountMode = "exact") -> Optional[int]:
+    if mode == "skip":
+        return None
+    if mode == "cached":
+        return _cached_count(db, query)
+    if mode == "estimated":
+        return _estimated_count(db, query)
+    return _exact_count(db, query)
+
 def sanitize_pagination(page: int = 1, per_page: int = DEFAULT_PAGE):
     page = max(1, int(page or 1))
     per_page = min(MAX_PER_PAGE, max(1, int(per_page or DEFAULT_PAGE)))
     
     return page, per_page
 
+
+def encode_cursor(order_by: str, direction: str, key: Sequence[Any]) -> str:
+    raw = json.dumps({"o": order_by, "d": direction, "k": list(key)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def key_type(column) -> type:
+    """Python type a cursor key of `column` must have: int for ids, str for titles/names,
+    float for computed ranks (bm25, ts_rank) whose SQL type is unknown."""
+    arguments = list(getattr(column, "clauses", ()))
+    if isinstance(column.type, NullType) and arguments:
+        # an untyped function of a column (lower(name)) keys like that column
+        return key_type(arguments[0])
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        python_type = None
+    # what is left untyped is a rank, and numbers compare as numbers
+    return python_type if python_type in (int, str) else float
+
+
+def _matches(value: Any, expected: type) -> bool:
+    if isinstance(value, bool):
+        return False
+    if expected is float:
+        return isinstance(value, (int, float))
+    return isinstance(value, expected)
+
+
+def decode_cursor(cursor: str, order_by: str, direction: str, types: Sequence[type]) -> List[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        key = data["k"]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+    if data.get("o") != order_by or data.get("d") != direction or not isinstance(key, list) or len(key) != len(types):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor does not match order_by/direction")
+    # the key goes straight into the WHERE clause: a value of the wrong type is a crafted cursor, not a 500
+    if not all(_matches(value, expected) for value, expected in zip(key, types)):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return key
+
+
+def keyset_page(
+    db: Session,
+    query,
+    columns: Sequence[Any],
+    order_by: str,
+    direction: str,
+    per_page: int,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Any], Optional[str]]:
+    # seek strictly after the last key of the previous page instead of OFFSET,
+    # so page 1000 costs the same as page 1 when `columns` are indexed
+    if cursor:
+        key = decode_cursor(cursor, order_by, direction, [key_type(col) for col in columns])
+        if len(columns) == 1:
+            row, value = columns[0], key[0]
+        else:
+            row, value = tuple_(*columns), tuple_(*[literal(v) for v in key])
+        query = query.where(row > value if direction == "asc" else row < value)
+
+    query = query.add_columns(*columns).order_by(
+        *[col.asc() if direction == "asc" else col.desc() for col in columns]
+    )
+    rows = db.execute(query.limit(per_page + 1)).all()
+
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+    next_cursor = encode_cursor(order_by, direction, rows[-1][1:]) if has_next else None
+
+    return [row[0] for row in rows], next_cursor
+
 def paginated_query(
     db: Session,
     model,
@@ -23,27 +187,36 @@ def paginated_query(
     order_by:  Optional[str] = 'id',
     direction: str = 'asc',
     alowed_order: Optional[Dict[str , Any]] = None,
+    cursor: Optional[str] = None,
+    count: CountMode = "exact",
     ):
     
     page, per_page = sanitize_pagination(page, per_page)
     query = base_query if base_query is not None else select(model)
     
-    total = db.scalar(select(func.count()).select_from(model)) or 0
+    if cursor is not None:
+        col = (alowed_order or {}).get(order_by, model.id)
+        columns = [model.id] if col is model.id else [col, model.id]
+        items, next_cursor = keyset_page(db, query, columns, order_by, direction, per_page, cursor)
+        return {"per_page": per_page, "items": items, "next_cursor": next_cursor, "has_next": next_cursor is not None}
+    
+    total = count_query(db, query, count)
     
-    if total == 0:
-        return {"total": 0, "pages": 0, "page": page, "per_page": per_page, "items": []}
+    if total == 0 and count in ("exact", "cached"):
+        return {"total": 0, "pages": 0, "page": page, "per_page": per_page, "has_next": False, "items": []}
     
     if alowed_order and order_by:
         col = alowed_order.get(order_by, alowed_order.get('id'))
-        query = query.order_by(col.asc() if direction == "desc" else col.asc())
+        query = query.order_by(col.asc() if direction == "asc" else col.desc())
         
-    items = db.execute(query.offset((page - 1) * per_page).limit(per_page)).scalars().all()
+    items = db.execute(query.offset((page - 1) * per_page).limit(per_page + 1)).scalars().all()
     
     return {
         "total": total,
-        "pages": ceil(total / per_page),
+        "pages": ceil(total / per_page) if total is not None else None,
         "page": page,
         "per_page": per_page,
-        "items": items
+        "has_next": len(items) > per_page,
+        "items": items[:per_page]
     }
    
\ No newline at end of file
@@ -0,0 +1,120 @@
+import asyncio
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+from fastapi import HTTPException, status
+from pwdlib import PasswordHash
+
+from app.core.config import settings
+
+
+password_hash = PasswordHash.recommended()
+
+
+# module level so a process pool can pickle them
+def _hash(plain: str) -> str:
+    return password_hash.hash(plain)
+
+
+def _verify(plain: str, hashed: str) -> bool:
+    return password_hash.verify(plain, hashed)
+
+
+def _timed(fn: Callable[..., Any], *args) -> tuple:
+    # wall clock: the worker may live in another process
+    return time.time(), fn(*args)
+
+
+class PasswordPool:
+    """Bounded executor for argon2 work, off the event loop and off the request threadpool.
+
+    At most `workers` hashes run at once and `max_queue` more may wait. Past that, callers
+    get a 503 instead of piling up, and the time spent queued is kept for stats().
+    """
+
+    def __init__(self, workers: int, max_queue: int, kind: str = "thread"):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.kind = kind
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self._waits: deque = deque(maxlen=1024)
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self.kind == "process":
+                        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                    else:
+                        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password")
+        return self._executor
+
+    def submit(self, fn: Callable[..., Any], *args) -> Future:
+        with self._lock:
+            if self.pending >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Too many authentication requests, retry shortly",
+                    headers={"Retry-After": "1"},
+                )
+            self.pending += 1
+
+        queued_at = time.time()
+        inner = self._get_executor().submit(_timed, fn, *args)
+        outer: Future = Future()
+
+        def done(future: Future) -> None:
+            with self._lock:
+                self.pending -= 1
+                self.completed += 1
+            try:
+                started_at, result = future.result()
+            except BaseException as e:
+                outer.set_exception(e)
+                return
+            with self._lock:
+                self._waits.append(max(0.0, started_at - queued_at))
+            outer.set_result(result)
+
+        inner.add_done_callback(done)
+        return outer
+
+    def run(self, fn: Callable[..., Any], *args) -> Any:
+        # from sync code: the calling thread waits, but the pool still caps the concurrency
+        return self.submit(fn, *args).result()
+
+    async def run_async(self, fn: Callable[..., Any], *args) -> Any:
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def stats(self) -> dict:
+        with self._lock:
+            waits = sorted(self._waits)
+            return {
+                "kind": self.kind,
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "pending": self.pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "queue_wait_ms": {
+                    "samples": len(waits),
+                    "p50": round(statistics.median(waits) * 1000, 2) if waits else 0.0,
+                    "p99": round(waits[int(len(waits) * 0.99) - 1 if len(waits) > 1 else 0] * 1000, 2) if waits else 0.0,
+                    "max": round(waits[-1] * 1000, 2) if waits else 0.0,
+                },
+            }
+
+
+password_pool = PasswordPool(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+    kind=settings.PASSWORD_HASH_EXECUTOR,
+)
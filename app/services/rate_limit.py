@@ -0,0 +1,176 @@
+import ipaddress
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.core.config import settings
+
+
+@dataclass(frozen=True)
+class Rule:
+    """Token bucket: `burst` requests at once, refilled at `rate` per second."""
+    name: str
+    rate: float
+    burst: float
+
+
+def _refill(rule: Rule, tokens: float, updated: float, now: float) -> float:
+    return min(rule.burst, tokens + (now - updated) * rule.rate)
+
+
+def _retry_after(rule: Rule, tokens: float, cost: float) -> float:
+    return (cost - tokens) / rule.rate if rule.rate > 0 else 60.0
+
+
+class MemoryStore:
+    """Buckets of this process, O(1) per check; the least recently used keys go first past max_keys."""
+
+    blocking = False  # a dict behind a lock, fine on the event loop
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, buckets: List[Tuple[str, Rule]], now: float, cost: float = 1.0) -> Tuple[bool, float]:
+        """One token from every bucket or from none: a denied request leaves all of them untouched."""
+        with self._lock:
+            levels = []
+            for key, rule in buckets:
+                tokens, updated = self._buckets.get(key, (rule.burst, now))
+                tokens = _refill(rule, tokens, updated, now)
+                if tokens < cost:
+                    return False, _retry_after(rule, tokens, cost)
+                levels.append((key, tokens))
+
+            for key, tokens in levels:
+                self._buckets[key] = (tokens - cost, now)
+                self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return True, 0.0
+
+
+class SQLiteStore:
+    """Buckets in a SQLite file shared by every worker on the host (put it on /dev/shm for speed).
+
+    A check reads and deducts its buckets in one write transaction (BEGIN IMMEDIATE), so
+    concurrent workers never hand out the same token twice. Blocking calls: the middleware
+    runs them in the threadpool, each worker thread with its own connection.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS token_buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")  # limits are disposable state, never fsync for them
+            self._local.conn = conn
+        return conn
+
+    def take(self, buckets: List[Tuple[str, Rule]], now: float, cost: float = 1.0) -> Tuple[bool, float]:
+        """One token from every bucket or from none: a denied request leaves all of them untouched."""
+        conn = self._connect()
+        keys = [key for key, _ in buckets]
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                f"SELECT key, tokens, updated FROM token_buckets WHERE key IN ({','.join('?' * len(keys))})", keys
+            )
+            stored = {key: (tokens, updated) for key, tokens, updated in rows}
+            levels = []
+            for key, rule in buckets:
+                tokens, updated = stored.get(key, (rule.burst, now))
+                tokens = _refill(rule, tokens, updated, now)
+                if tokens < cost:
+                    conn.execute("ROLLBACK")
+                    return False, _retry_after(rule, tokens, cost)
+                levels.append((key, tokens - cost, now))
+            conn.executemany("INSERT OR REPLACE INTO token_buckets (key, tokens, updated) VALUES (?, ?, ?)", levels)
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        return True, 0.0
+
+
+class Blocklist:
+    """Exact addresses in a set (O(1)), CIDR ranges checked one by one."""
+
+    def __init__(self, entries: Iterable[str]):
+        self.addresses = set()
+        self.networks: List[ipaddress._BaseNetwork] = []
+        for entry in entries:
+            network = ipaddress.ip_network(entry.strip(), strict=False)
+            if network.num_addresses == 1:
+                self.addresses.add(network.network_address)
+            else:
+                self.networks.append(network)
+
+    def __contains__(self, ip: str) -> bool:
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return False
+        return address in self.addresses or any(address in network for network in self.networks)
+
+
+class RateLimiter:
+    def __init__(self, store, ip_rule: Rule, user_rule: Rule, route_rules: Dict[Tuple[str, str], Rule]):
+        self.store = store
+        self.ip_rule = ip_rule
+        self.user_rule = user_rule
+        self.route_rules = route_rules
+
+    def check(self, ip: str, user_id: Optional[str], method: str, path: str) -> Tuple[bool, float]:
+        """(allowed, seconds until the exhausted bucket has a token again)."""
+        now = time.time()
+        buckets = [(f"ip:{ip}", self.ip_rule)]
+        if user_id:
+            buckets.append((f"user:{user_id}", self.user_rule))
+        route_rule = self.route_rules.get((method, path))
+        if route_rule:
+            # per route and per client: one noisy client does not lock everyone out of /login
+            buckets.append((f"route:{route_rule.name}:{user_id or ip}", route_rule))
+
+        # all buckets are checked before any is charged: a request denied by its route bucket
+        # must not drain the IP budget the client's other requests live on
+        return self.store.take(buckets, now)
+
+
+def build_limiter() -> RateLimiter:
+    if settings.RATE_LIMIT_STORE == "sqlite":
+        store = SQLiteStore(settings.RATE_LIMIT_SQLITE_PATH)
+    else:
+        store = MemoryStore(settings.RATE_LIMIT_MAX_KEYS)
+
+    # login/token/register run argon2, they get a much smaller bucket than the rest
+    auth = Rule("auth", settings.RATE_LIMIT_AUTH_RATE, settings.RATE_LIMIT_AUTH_BURST)
+    return RateLimiter(
+        store,
+        ip_rule=Rule("ip", settings.RATE_LIMIT_IP_RATE, settings.RATE_LIMIT_IP_BURST),
+        user_rule=Rule("user", settings.RATE_LIMIT_USER_RATE, settings.RATE_LIMIT_USER_BURST),
+        route_rules={
+            ("POST", "/api/v1/auth/login"): auth,
+            ("POST", "/api/v1/auth/token"): auth,
+            ("POST", "/api/v1/auth/register"): auth,
+        },
+    )
+
+
+blocklist = Blocklist(entry for entry in settings.IP_BLOCKLIST.split(",") if entry.strip())
+limiter = build_limiter()
@@ -0,0 +1,95 @@
+import re
+from typing import Any, List, Optional, Tuple
+from sqlalchemy import Float, column, func, literal_column, table, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.post import PostORM
+
+
+# SQLite: FTS5 table keyed by rowid = post.id, kept in sync by the post repository
+# Postgres: generated tsvector column + GIN index, kept in sync by the database itself
+post_fts = table("post_fts", column("rowid"), column("title"), column("content"))
+
+FTS_ENABLED = {"sqlite": False, "postgresql": False}
+
+
+def ensure_search_index(engine: Engine) -> None:
+    dialect = engine.dialect.name
+
+    if dialect == "sqlite":
+        try:
+            with engine.begin() as conn:
+                exists = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'post_fts'")).first()
+                if not exists:
+                    conn.execute(text(
+                        "CREATE VIRTUAL TABLE post_fts USING fts5("
+                        "title, content, tokenize = 'unicode61 remove_diacritics 2')"
+                    ))
+                    conn.execute(text("INSERT INTO post_fts(rowid, title, content) SELECT id, title, content FROM post"))
+        except OperationalError:
+            return # sqlite built without fts5, search falls back to LIKE
+        FTS_ENABLED["sqlite"] = True
+
+    elif dialect == "postgresql":
+        cfg = settings.SEARCH_TS_CONFIG
+        with engine.begin() as conn:
+            conn.execute(text(
+                "ALTER TABLE post ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+                f"setweight(to_tsvector('{cfg}', coalesce(title, '')), 'A') || "
+                f"setweight(to_tsvector('{cfg}', coalesce(content, '')), 'B')) STORED"
+            ))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_post_search_vector ON post USING GIN (search_vector)"))
+        FTS_ENABLED["postgresql"] = True
+
+
+def _dialect(db: Session) -> str:
+    return db.get_bind().dialect.name
+
+
+def index_post(db: Session, post: PostORM) -> None:
+    if _dialect(db) != "sqlite" or not FTS_ENABLED["sqlite"]:
+        return
+
+    db.execute(text("DELETE FROM post_fts WHERE rowid = :id"), {"id": post.id})
+    db.execute(
+        text("INSERT INTO post_fts(rowid, title, content) VALUES (:id, :title, :content)"),
+        {"id": post.id, "title": post.title, "content": post.content},
+    )
+
+
+def index_new_posts(db: Session, rows: List[dict]) -> None:
+    # rows of freshly inserted posts: {"id", "title", "content"}
+    if _dialect(db) != "sqlite" or not FTS_ENABLED["sqlite"] or not rows:
+        return
+
+    db.execute(text("INSERT INTO post_fts(rowid, title, content) VALUES (:id, :title, :content)"), rows)
+
+
+def unindex_post(db: Session, post_id: int) -> None:
+    if _dialect(db) != "sqlite" or not FTS_ENABLED["sqlite"]:
+        return
+
+    db.execute(text("DELETE FROM post_fts WHERE rowid = :id"), {"id": post_id})
+
+
+def apply_search(db: Session, stmt, query: str) -> Tuple[Any, Optional[Any]]:
+    """Filter `stmt` (a select over PostORM) by `query` and return it with a rank column, lower is better."""
+    terms = re.findall(r"\w+", query)
+    dialect = _dialect(db)
+
+    if not terms or not FTS_ENABLED.get(dialect):
+        like = f"%{query}%"
+        return stmt.where(PostORM.title.ilike(like) | PostORM.content.ilike(like)), None
+
+    if dialect == "sqlite":
+        # every term as a quoted prefix so "pyth" still finds "python", title weighs 10x content
+        match = " ".join(f'"{term}"*' for term in terms)
+        stmt = stmt.join(post_fts, post_fts.c.rowid == PostORM.id).where(literal_column("post_fts").op("MATCH")(match))
+        return stmt, func.bm25(literal_column("post_fts"), 10.0, 1.0, type_=Float)
+
+    tsquery = func.to_tsquery(settings.SEARCH_TS_CONFIG, " & ".join(f"{term}:*" for term in terms))
+    vector = literal_column("post.search_vector")
+    return stmt.where(vector.op("@@")(tsquery)), -func.ts_rank_cd(vector, tsquery, type_=Float)
@@ -1,27 +1,116 @@
-from sqlalchemy import select
+import re
+from collections import Counter
+from typing import Dict, List
+from sqlalchemy import or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 from slugify import slugify as _slugify
 
 from app.models.post import PostORM
+from app.models.slug_counter import SlugCounterORM
 
 def slugify_base(text: str) -> str:
     slug = _slugify(text, lowercase=True, separator="-")
     return slug
 
 
+LEGACY_LOOKUP_BATCH = 100
+
+
+def _legacy_numbers(db: Session, bases) -> Dict[str, int]:
+    """Highest number already used by each base ("foo" is 1, "foo-7" is 7), in one query.
+
+    Only needed the first time a base gets a counter, so a database whose posts predate
+    slug_counters does not walk its old suffixes one exists check at a time.
+    """
+    bases = list(bases)
+    highest = dict.fromkeys(bases, 0)
+    # a bulk import brings a thousand new bases at once, SQLite caps the depth of one OR chain
+    for start in range(0, len(bases), LEGACY_LOOKUP_BATCH):
+        chunk = bases[start:start + LEGACY_LOOKUP_BATCH]
+        conditions = [or_(PostORM.slug == base, PostORM.slug.like(f"{base}-%")) for base in chunk]
+        for slug in db.execute(select(PostORM.slug).where(or_(*conditions))).scalars():
+            for base in chunk:
+                if slug == base:
+                    highest[base] = max(highest[base], 1)
+                elif slug.startswith(base + "-") and re.fullmatch(r"\d+", slug[len(base) + 1:]):
+                    highest[base] = max(highest[base], int(slug[len(base) + 1:]))
+    return highest
+
+
+def _reserve_numbers(db: Session, wanted: Dict[str, int]) -> Dict[str, int]:
+    """Bump the counter of every base by its wanted amount, returns the new last number per base."""
+    dialect = db.get_bind().dialect.name
+    
+    # one atomic upsert: concurrent creates with the same base always get different numbers
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        query = insert(SlugCounterORM).values([{"base": base, "last": n} for base, n in wanted.items()])
+        query = query.on_conflict_do_update(
+            index_elements=[SlugCounterORM.base],
+            set_={"last": SlugCounterORM.last + query.excluded.last},
+        ).returning(SlugCounterORM.base, SlugCounterORM.last)
+        reserved = {base: last for base, last in db.execute(query).all()}
+
+        # last == n only for a row this upsert created (an existing row ends above n): start it after
+        # the numbers legacy posts already use. The new row stays locked until commit, so no one else
+        # reserved from it in between.
+        fresh = [base for base, n in wanted.items() if reserved[base] == n]
+        if fresh:
+            for base, used in _legacy_numbers(db, fresh).items():
+                if used:
+                    db.execute(update(SlugCounterORM).where(SlugCounterORM.base == base).values(last=SlugCounterORM.last + used))
+                    reserved[base] += used
+        return reserved
+    
+    reserved = {}
+    for base, n in wanted.items():
+        counter = db.execute(select(SlugCounterORM).where(SlugCounterORM.base == base).with_for_update()).scalar_one_or_none()
+        if counter is None:
+            used = _legacy_numbers(db, [base])[base]
+            db.add(SlugCounterORM(base=base, last=used + n))
+            db.flush()
+            reserved[base] = used + n
+        else:
+            db.execute(update(SlugCounterORM).where(SlugCounterORM.base == base).values(last=SlugCounterORM.last + n))
+            reserved[base] = counter.last + n
+    return reserved
+
+
+def _candidate(base: str, number: int) -> str:
+    return base if number == 1 else f"{base}-{number}"
+
+
 def ensure_unique_slug(db: Session, base_text: str) -> str:
     base = slugify_base(base_text)
-    existing = db.execute(
-        select(PostORM.slug).where(PostORM.slug.like(f"{base}%"))
-    ).scalars().all()    
-    if base not in existing:
-        return base
     
-    i = 2
-    candidate = f"{base}-{i}"
-    while candidate in existing:
-        i += 1
-        candidate = f"{base}-{i}"
-    return candidate
+    # the counter is the source of truth; the exists check only skips slugs taken some other way
+    # (posts created before the counter existed, or a title like "weekly update 2")
+    while True:
+        candidate = _candidate(base, _reserve_numbers(db, {base: 1})[base])
+        taken = db.execute(select(PostORM.id).where(PostORM.slug == candidate)).first()
+        if not taken:
+            return candidate
+
+
+def allocate_slugs(db: Session, titles: List[str]) -> List[str]:
+    """Unique slugs for a batch of titles: one counter upsert and one exists query for the whole batch."""
+    bases = [slugify_base(title) for title in titles]
+    wanted = Counter(bases)
+    last = _reserve_numbers(db, wanted)
+    
+    next_number = {base: last[base] - n + 1 for base, n in wanted.items()}
+    candidates = []
+    for base in bases:
+        candidates.append(_candidate(base, next_number[base]))
+        next_number[base] += 1
     
-    
\ No newline at end of file
+    taken = set(db.execute(select(PostORM.slug).where(PostORM.slug.in_(candidates))).scalars())
+    slugs = []
+    for title, candidate in zip(titles, candidates):
+        # rare: taken outside the counter, or "foo-2" from base "foo" vs the title "Foo 2" in the same batch
+        while candidate in taken:
+            candidate = ensure_unique_slug(db, title)
+        taken.add(candidate)
+        slugs.append(candidate)
+    return slugs
\ No newline at end of file
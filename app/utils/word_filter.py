@@ -0,0 +1,59 @@
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+
+class WordFilter:
+    """Aho-Corasick automaton over a blocklist: one pass over the text finds every listed word it contains."""
+
+    def __init__(self, words: Iterable[str]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[List[str]] = [[]]
+
+        for word in dict.fromkeys(w.strip().lower() for w in words if w.strip()):
+            self._add(word)
+        self._build()
+
+    def _add(self, word: str) -> None:
+        state = 0
+        for char in word:
+            if char not in self.goto[state]:
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+                self.goto[state][char] = len(self.goto) - 1
+            state = self.goto[state][char]
+        self.output[state].append(word)
+
+    def _build(self) -> None:
+        queue = deque(self.goto[0].values())  # depth-1 states already fail to the root
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self.goto[state].items():
+                queue.append(nxt)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[nxt] = self.goto[fallback].get(char, 0)
+                self.output[nxt] = self.output[nxt] + self.output[self.fail[nxt]]
+
+    def find_all(self, text: str) -> List[str]:
+        """Every distinct blocked word found in `text` (case-insensitive), in order of appearance."""
+        hits: Dict[str, None] = {}
+        state = 0
+        for char in text.lower():
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            for word in self.output[state]:
+                hits.setdefault(word, None)
+        return list(hits)
+
+
+def load_words(path: Optional[str], default: Iterable[str]) -> List[str]:
+    """Blocklist from `path` (one entry per line, # comments) or `default` when no file is configured."""
+    if not path:
+        return list(default)
+
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
@@ -0,0 +1,114 @@
+"""Compare DB_MODE=sync and DB_MODE=async on the read endpoints.
+
+    python benchmarks/db_mode.py --requests 2000 --concurrency 100
+
+Each mode runs in its own process (the engine is picked at import time) against a
+fresh SQLite file seeded with the same posts, requests go through httpx's ASGI
+transport so only the app and the database are measured. Async mode needs
+`pip install "sqlalchemy[asyncio]" aiosqlite` (asyncpg for Postgres).
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PATHS = ["/posts?per_page=10", "/posts?per_page=10&search=post", "/posts/1", "/tags", "/categories"]
+
+
+def seed(posts: int) -> None:
+    import app.main  # noqa: F401, creates the tables and the search index
+    from app.core.db import SessionLocal
+    from app.models import PostORM, TagORM
+
+    with SessionLocal() as db:
+        tags = [TagORM(name=f"tag{i}") for i in range(20)]
+        db.add_all(tags)
+        db.add_all(
+            PostORM(title=f"Benchmark post {i}", slug=f"benchmark-post-{i}", content="lorem ipsum " * 200, tags=tags[i % 20:i % 20 + 3])
+            for i in range(posts)
+        )
+        db.commit()
+
+
+async def hammer(total: int, concurrency: int) -> dict:
+    import httpx
+    from app.main import app
+
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(PATHS[i % len(PATHS)])
+
+    async def worker(client):
+        nonlocal errors
+        while not queue.empty():
+            path = queue.get_nowait()
+            start = time.perf_counter()
+            response = await client.get(path)
+            latencies.append(time.perf_counter() - start)
+            errors += response.status_code != 200
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "mode": os.environ["DB_MODE"],
+        "requests": total,
+        "errors": errors,
+        "req_per_s": round(total / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+    }
+
+
+def child(args) -> None:
+    seed(args.posts)
+    print(json.dumps(asyncio.run(hammer(args.requests, args.concurrency))))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--posts", type=int, default=500)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return child(args)
+
+    for mode in ("sync", "async"):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = {
+                **os.environ,
+                "DB_MODE": mode,
+                "DATABASE_URL": f"sqlite:///{tmp}/bench.db",
+                "PYTHONPATH": ROOT,
+                # measure the database path, not the response caches
+                "POST_CACHE_SIZE": "0",
+                "COUNT_CACHE_SIZE": "0",
+                "RATE_LIMIT_ENABLED": "false",
+            }
+            result = subprocess.run(
+                [sys.executable, __file__, "--child", *sys.argv[1:]],
+                env=env, cwd=tmp, capture_output=True, text=True,
+            )
+            if result.returncode:
+                print(f"{mode}: failed\n{result.stderr.strip().splitlines()[-1]}")
+                continue
+            print(result.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Latency of an unrelated endpoint (GET /categories) while logins hammer argon2.
+
+    python benchmarks/login_storm.py --logins 200 --concurrency 50
+
+Runs in a fresh SQLite file through httpx's ASGI transport: first the probe alone,
+then the same probe during the login storm. PASSWORD_HASH_WORKERS /
+PASSWORD_HASH_EXECUTOR pick the password pool being measured.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def summary(latencies: list) -> str:
+    latencies = sorted(latencies)
+    p99 = latencies[max(0, int(len(latencies) * 0.99) - 1)]
+    return f"n={len(latencies)} p50={statistics.median(latencies) * 1000:.1f}ms p99={p99 * 1000:.1f}ms max={latencies[-1] * 1000:.1f}ms"
+
+
+async def main(args) -> None:
+    import httpx
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        credentials = {"email": "storm@example.com", "password": "storm-password-123"}
+        await client.post("/api/v1/auth/register", json={**credentials, "full_name": "Storm"})
+
+        async def probe(duration: float) -> list:
+            latencies = []
+            stop = time.perf_counter() + duration
+            while time.perf_counter() < stop:
+                start = time.perf_counter()
+                await client.get("/categories")
+                latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(0.005)
+            return latencies
+
+        print("idle   ", summary(await probe(args.idle)))
+
+        queue = asyncio.Queue()
+        for _ in range(args.logins):
+            queue.put_nowait(credentials)
+        statuses = {}
+
+        async def login_worker():
+            while not queue.empty():
+                response = await client.post("/api/v1/auth/login", json=queue.get_nowait())
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        started = time.perf_counter()
+        storm = asyncio.gather(*(login_worker() for _ in range(args.concurrency)))
+        probed = []
+        while not storm.done():
+            probed += await probe(0.2)
+        await storm
+        print("storm  ", summary(probed), f"logins={statuses} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--idle", type=float, default=2.0, help="seconds of probing before the storm")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.chdir(tmp)
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{tmp}/bench.db")
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")  # the storm comes from a single client
+    sys.path.insert(0, ROOT)
+    asyncio.run(main(args))
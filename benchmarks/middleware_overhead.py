@@ -0,0 +1,75 @@
+"""Per-request cost of register_middleware, measured on a route that does nothing.
+
+    python benchmarks/middleware_overhead.py --requests 20000
+
+Calls the ASGI app directly (no client, no sockets) for a bare FastAPI app and for the
+same app with the project's middleware, the difference is the middleware overhead.
+The access log goes to /dev/null and the rate limits are raised so every request
+still runs the bucket check without being rejected.
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def build(with_middleware: bool):
+    from fastapi import FastAPI
+    from fastapi.responses import PlainTextResponse
+    from app.core.middleware import register_middleware
+
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return PlainTextResponse("pong")
+
+    if with_middleware:
+        register_middleware(app)
+    return app
+
+
+async def measure(app, total: int) -> float:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/ping", "raw_path": b"/ping", "root_path": "", "query_string": b"",
+        "headers": [(b"host", b"bench"), (b"x-request-id", b"bench-request")],
+        "client": ("127.0.0.1", 5000), "server": ("bench", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    for _ in range(200):  # warm up
+        await app(dict(scope), receive, send)
+    started = time.perf_counter()
+    for _ in range(total):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - started) / total * 1_000_000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    os.environ.setdefault("RATE_LIMIT_IP_RATE", "1e9")
+    os.environ.setdefault("RATE_LIMIT_IP_BURST", "1e9")
+    sys.path.insert(0, ROOT)
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        bare = asyncio.run(measure(build(False), args.requests))
+        full = asyncio.run(measure(build(True), args.requests))
+    print(f"bare app       {bare:8.1f} us/request")
+    print(f"with middleware {full:7.1f} us/request  (overhead {full - bare:.1f} us)")
+
+
+if __name__ == "__main__":
+    main()
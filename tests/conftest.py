@@ -0,0 +1,51 @@
+import os
+import tempfile
+
+# the app reads its settings at import time: point it at a throwaway database first
+_tmp = tempfile.mkdtemp(prefix="blog_api_tests_")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/test.db"
+os.environ["READ_REPLICA_URLS"] = ""
+os.environ["DB_MODE"] = "sync"
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+os.environ["ACCESS_LOG_LEVEL"] = "CRITICAL"
+os.environ["SQL_STATS_ENABLED"] = "true"
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.core.db import SessionLocal
+from app.models import CategoryORM, PostORM, TagORM, User
+
+
+AUTHORS = 3
+CATEGORIES = 4
+TAGS = 8
+POSTS = 60
+
+
+@pytest.fixture(scope="session")
+def seeded():
+    # posts spread over several authors, categories and tags, so an N+1 on any of them shows up
+    with SessionLocal() as db:
+        users = [User(email=f"author{i}@example.com", full_name=f"Author {i}", hashed_password="x", role="editor") for i in range(AUTHORS)]
+        categories = [CategoryORM(name=f"Category {i}", slug=f"category-{i}") for i in range(CATEGORIES)]
+        tags = [TagORM(name=f"tag{i}") for i in range(TAGS)]
+        db.add_all(users + categories + tags)
+        for i in range(POSTS):
+            db.add(PostORM(
+                title=f"Seeded post {i:03d}",
+                slug=f"seeded-post-{i:03d}",
+                content=f"Content of seeded post {i}",
+                user=users[i % AUTHORS],
+                category=categories[i % CATEGORIES],
+                tags=[tags[i % TAGS], tags[(i + 3) % TAGS]],
+            ))
+        db.commit()
+    return {"posts": POSTS}
+
+
+@pytest.fixture(scope="session")
+def client(seeded):
+    with TestClient(app) as test_client:
+        yield test_client
@@ -0,0 +1,74 @@
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import InvalidRequestError
+
+from app.api.v1.post.schemas import POST_FIELDS, PostPublic, PostSummary, post_fields_model
+from app.api.v1.tags.schemas import TagPublic
+from app.core.db import SessionLocal
+from app.core.query_stats import QueryStats, current_stats
+from app.models import PostORM, TagORM
+from app.models.profiles import with_fields, with_profile
+
+
+def serialize_without_sql(schema, rows) -> QueryStats:
+    # relationships are raise_on_sql, deferred columns would still lazy load: count those too
+    stats = QueryStats()
+    token = current_stats.set(stats)
+    try:
+        for row in rows:
+            schema.model_validate(row, from_attributes=True).model_dump(mode="json")
+    finally:
+        current_stats.reset(token)
+    return stats
+
+
+@pytest.mark.parametrize("profile, schema", [("post_full", PostPublic), ("post_summary", PostSummary)])
+def test_post_profiles_load_everything_their_schema_renders(seeded, profile, schema):
+    with SessionLocal() as db:
+        posts = db.execute(with_profile(select(PostORM), profile).limit(20)).unique().scalars().all()
+        assert posts
+        assert serialize_without_sql(schema, posts).count == 0
+
+
+@pytest.mark.parametrize("fields", [(name,) for name in POST_FIELDS] + [POST_FIELDS, ("id", "title", "slug"), ("id", "tags", "user", "category")])
+def test_sparse_fieldsets_load_everything_they_render(seeded, fields):
+    fields = tuple(name for name in POST_FIELDS if name in fields or name == "id")
+    with SessionLocal() as db:
+        posts = db.execute(with_fields(select(PostORM), fields).limit(20)).unique().scalars().all()
+        assert posts
+        assert serialize_without_sql(post_fields_model(fields), posts).count == 0
+
+
+def test_post_write_profile_reads_columns_only(seeded):
+    with SessionLocal() as db:
+        post = db.execute(with_profile(select(PostORM), "post_write").limit(1)).scalar_one()
+        stats = QueryStats()
+        token = current_stats.set(stats)
+        try:
+            # what the delete/update paths touch
+            post.id, post.title, post.slug, post.image_url, post.category_id, post.user_id  # columns only, no SQL
+        finally:
+            current_stats.reset(token)
+        assert stats.count == 0
+        with pytest.raises(InvalidRequestError, match="raise"):
+            post.tags
+
+
+def test_tag_only_profile_never_reaches_posts(seeded):
+    with SessionLocal() as db:
+        tags = db.execute(with_profile(select(TagORM), "tag_only")).scalars().all()
+        assert tags
+        assert serialize_without_sql(TagPublic, tags).count == 0
+        with pytest.raises(InvalidRequestError, match="raise"):
+            tags[0].posts
+
+
+@pytest.mark.parametrize("relationship", ["user", "category", "tags"])
+def test_relationships_raise_by_default(seeded, relationship):
+    # no loader options: what a query that forgot its profile gets from the model defaults
+    with SessionLocal() as db:
+        post = db.execute(
+            select(PostORM).where(PostORM.user_id.is_not(None), PostORM.category_id.is_not(None)).limit(1)
+        ).scalar_one()
+        with pytest.raises(InvalidRequestError, match="raise"):
+            getattr(post, relationship)
@@ -0,0 +1,23 @@
+import pytest
+
+
+# version lookup for the ETag, COUNT, the page (author and category joined in), the tags (one selectin)
+LIST_QUERIES = 4
+
+
+@pytest.mark.parametrize("per_page", [5, 50])
+def test_list_posts_runs_a_fixed_number_of_queries(client, per_page):
+    response = client.get("/posts", params={"per_page": per_page, "count": "exact"})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert len(body["items"]) == per_page
+    assert all(item["user"] and item["category"] and item["tags"] for item in body["items"])
+    assert int(response.headers["x-db-queries"]) == LIST_QUERIES
+
+
+def test_list_posts_without_count_skips_the_count_query(client):
+    response = client.get("/posts", params={"per_page": 50, "count": "skip"})
+
+    assert response.status_code == 200
+    assert int(response.headers["x-db-queries"]) == LIST_QUERIES - 1
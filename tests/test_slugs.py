@@ -0,0 +1,34 @@
+from sqlalchemy import delete, insert
+
+from app.core.db import SessionLocal
+from app.core.query_stats import QueryStats, current_stats
+from app.models import PostORM, SlugCounterORM
+from app.utils.slugify_utils import allocate_slugs, ensure_unique_slug
+
+LEGACY = 2000
+
+
+def test_first_slug_of_a_base_skips_legacy_suffixes_in_constant_queries(seeded):
+    with SessionLocal() as db:
+        # posts from before slug_counters existed: weekly-update, weekly-update-2 ... -2000, no counter row
+        db.execute(insert(PostORM), [
+            {"title": f"Weekly update {i}", "slug": "weekly-update" if i == 1 else f"weekly-update-{i}", "content": f"legacy {i}"}
+            for i in range(1, LEGACY + 1)
+        ])
+        db.execute(delete(SlugCounterORM).where(SlugCounterORM.base == "weekly-update"))
+        db.commit()
+
+        stats = QueryStats()
+        token = current_stats.set(stats)
+        try:
+            slug = ensure_unique_slug(db, "Weekly update")
+            batch = allocate_slugs(db, ["Weekly update", "Weekly update"])
+        finally:
+            current_stats.reset(token)
+        db.rollback()
+        db.execute(delete(PostORM).where(PostORM.slug.like("weekly-update%")))
+        db.commit()
+
+    assert slug == f"weekly-update-{LEGACY + 1}"
+    assert batch == [f"weekly-update-{LEGACY + 2}", f"weekly-update-{LEGACY + 3}"]
+    assert stats.count <= 6
@@ -0,0 +1,15 @@
+from app.api.v1.tags.repository import TagRepository
+from app.core.db import SessionLocal
+
+
+def test_tags_keep_their_spelling_and_match_case_insensitively(seeded):
+    with SessionLocal() as db:
+        repository = TagRepository(db)
+        created = repository.create_tag("FastAPI")
+        assert created.name == "FastAPI"
+
+        assert repository.create_tag("fastapi ").id == created.id
+        same, new = repository.ensure_tags(["FASTAPI", "Type-Hints", "type-hints"])
+        assert same.id == created.id
+        assert new.name == "Type-Hints"
+        db.rollback()